@@ -1,15 +1,21 @@
 import os
 os.environ["AGNO_DEBUG"] = "True"
 from agno.agent import Agent , AgentKnowledge
-from agno.embedder.ollama import OllamaEmbedder
 from agno.knowledge.text import TextKnowledgeBase
+from agno.memory.agent import AgentRun
+from agno.models.message import Message
 from agno.models.google import Gemini
 from agno.run.response import RunEvent, RunResponse
 from agno.storage.sqlite import SqliteStorage
-from agno.vectordb.lancedb import LanceDb , SearchType
+from agno.vectordb.lancedb import SearchType
 from agno.tools.duckdb import DuckDbTools
 from utils.env_config import GEMINI_API_KEY_12
 from mcp_email_tool import EmailTool
+from cv_search_tool import CvSearchTool
+from utils.embedding_cache import CachedOllamaEmbedder
+from utils.lancedb_index import IndexManager
+from utils.cv_store import CvLanceDb
+from utils.cv_retriever import cv_retriever
 
 def as_text(chunks):
     """Convertit les chunks de réponse en texte"""
@@ -121,21 +127,82 @@ def as_stream(chunks):
             yield chunks
 
 
-# Configuration des composants
-def create_agent():
-    """Crée et configure l'agent d'IA"""
-    # Utilisation de la variable d'environnement pour la clé API
-    gemini_api_key = GEMINI_API_KEY_12
-    
-    vector_db = LanceDb(
-        table_name="cvs",
-        uri="lancedb",
-        search_type=SearchType.hybrid,
-        embedder=OllamaEmbedder(id="nomic-embed-text", dimensions=768),
-    )
-
-    print(f"[DEBUG] Initializing knowledge base from path: 'txt'")
-    cvs_base = TextKnowledgeBase(path="txt", vector_db=vector_db, num_documents=5)
+async def as_async_stream(chunks):
+    """Génère un stream à partir des chunks de réponse d'un run asynchrone (agent.arun)"""
+    async for chunk in chunks:
+        if isinstance(chunk, RunResponse) and isinstance(chunk.content, str):
+            if chunk.event == RunEvent.run_response:
+                yield chunk.content
+        elif isinstance(chunk, str):
+            yield chunk
+
+
+# Instructions de l'agent, communes à toutes les sessions
+agent_instructions = [
+    "Répondez uniquement en français.",
+    "Se contenter uniquement des données de la base de connaissances.",
+    "Ne pas effectuer de recherche sur internet.",
+    "Afficher le résultat en tableau.",
+    "RÉSULTATS PRÉFILTRÉS: Si le message contient des <references> commençant par 'filtres_appliques', ces résultats proviennent déjà d'une recherche filtrée (date, ville, expérience, poste). Répondre directement à partir de ces références sans relancer de recherche, et si 'nombre_de_resultats' vaut 0, indiquer qu'aucun CV ne correspond aux critères. 'nombre_de_resultats' est le nombre total de candidats correspondants ; si 'liste_tronquee' est vrai, seuls 'candidats_fournis' candidats (les plus récents ou les plus pertinents) sont détaillés : annoncer le total et proposer d'affiner les critères.",
+    "IMPORTANT: Utilisez UNIQUEMENT les outils de recherche intégrés d'Agno, ne pas utiliser 'default_api' ou 'print()'.",
+    "Pour effectuer une recherche, utilisez directement les capacités de l'agent sans appeler d'API externe.",
+    "RECHERCHE: Si aucune <references> préfiltrée ('filtres_appliques' ou 'candidats_de_la_session') n'a été fournie, faire UN SEUL appel à search_cvs_multi avec toutes les variantes utiles (mots-clés, formats de date) ; si des références préfiltrées sont fournies, ne pas relancer de recherche.",
+    "Ne JAMAIS répondre 'Je n'ai pas cette information' sans avoir fait de recherches.",
+    "IMPORTANT: Pour rechercher dans la base de connaissances, utiliser les fonctionnalités intégrées de l'agent sans appeler de fonctions externes.",
+    "INTERDICTION: Ne JAMAIS utiliser 'print()', 'default_api', ou toute autre fonction externe pour la recherche.",
+    "RECHERCHE CORRECTE: Quand un utilisateur demande des informations, répondez directement en utilisant la base de connaissances intégrée sans générer de code tool_call.",
+    "FORMAT DE RÉPONSE: Répondez DIRECTEMENT avec les informations trouvées sous forme de tableau markdown, sans générer de code ou de tool_call.",
+    "INTERDICTION ABSOLUE: Ne JAMAIS générer de code Python, de tool_call, ou d'appel à default_api dans la réponse.",
+    "PASSAGES DÉJÀ FOURNIS: Chaque passage porte une référence ('ref': 'R1', 'R2'...). Un résultat {'deja_fourni': 'R3'} renvoie au passage R3 déjà reçu plus tôt : le réutiliser sans le redemander.",
+    "QUESTIONS DE SUIVI: Si les <references> commencent par 'candidats_de_la_session', ce sont les candidats de la réponse précédente (avec email et téléphone) : les utiliser directement sans relancer de recherche.",
+    "DÉDUPLICATION: Les résultats sont déjà regroupés par candidat (candidate_id, dernière version seulement) : présenter une seule entrée par candidate_id.",
+    "Distinguer clairement les informations des CV et les informations de suivi de candidature.",
+    "Pour les résultats contenant 'status:' dans le document, créer une section 'Suivi de candidature'.",
+    "Pour les CV, créer une section 'Contenu du CV' et afficher le texte du CV.",
+    "Afficher le nom du CV comme un lien Markdown : '[nom du cv](./app/static/cvs/[nom du cv])'",
+    "Pour chaque ajout dans la base de connaissances, ajoute : 'DATE MAJ = [maintenant]'",
+    "Ne pas montrer la colonne 'DATE MAJ' si ce n'est pas demandé",
+    "Pour la colonne 'VISIO', afficher 'https://wa.me/[Tél]'. Supprimer les espaces de [Tél] et si le num commence avec '06' remplacer par '2126' et '07' par '2127'.",
+    "Ne pas montrer la colonne 'Tél' si ce n'est pas demandé",
+    "Ne pas montrer la colonne 'VISIO' si ce n'est pas demandé",            "IMPORTANT: Chaque CV contient une date de réception au début du texte au format 'Date de réception : JJ/MM/AAAA à HH:MM'. Utiliser cette information pour filtrer les CV par date de réception.",
+    "Analyser le contenu complet des CV pour extraire toutes les informations pertinentes même si elles contiennent des caractères spéciaux comme les deux-points.",
+    "ENVOI D'EMAIL - FONCTIONNALITÉ:",
+    "- Vous pouvez envoyer des emails aux candidats en utilisant l'outil email.",
+    "- Pour envoyer un email, utilisez la fonction send_email avec les paramètres : destinataire, sujet, contenu.",
+    "- Personnalisez toujours le contenu de l'email avec les informations du candidat trouvées dans la base.",
+    "- Demandez confirmation avant d'envoyer un email.",
+    "- Formats d'email supportés : entretien, refus, demande d'information, convocation.",
+]
+
+
+class AgentFactory:
+    """Construit une fois les composants coûteux et fournit un agent isolé par requête.
+
+    La base LanceDB, l'embedder, le client Gemini, le stockage SQLite et les instructions
+    sont partagés. Chaque agent a son propre modèle (qui porte les fonctions de l'agent),
+    ses propres outils (liés à l'agent qui les appelle) et son propre état de session.
+    """
+
+    def __init__(self):
+        # Utilisation de la variable d'environnement pour la clé API
+        self.gemini_api_key = GEMINI_API_KEY_12
+
+        self.vector_db = CvLanceDb(
+            table_name="cvs",
+            uri="lancedb",
+            search_type=SearchType.hybrid,
+            embedder=CachedOllamaEmbedder(id="nomic-embed-text", dimensions=768),
+        )
+
+        # Les index sont construits par process_txt.py et l'endpoint d'administration, pas au
+        # démarrage : seul l'état enregistré est lu
+        index_state = IndexManager(self.vector_db.table).load_state()
+        if index_state.get("fts", {}).get("built_at"):
+            # L'index FTS est tenu à jour par le gestionnaire : agno n'a pas à le recréer
+            self.vector_db.fts_index_exists = True
+
+        print(f"[DEBUG] Initializing knowledge base from path: 'txt'")
+        self.knowledge = TextKnowledgeBase(path="txt", vector_db=self.vector_db, num_documents=5)
       # Vérification de la base de connaissances (debug uniquement)
     #if os.environ.get("AGNO_DEBUG") == "True":
         #try:
@@ -169,79 +236,65 @@ def create_agent():
             #print(f"[DEBUG] Error during knowledge base verification: {e}")
     
 
-    storage = SqliteStorage(
-        table_name="agent_sessions", db_file="sqlite.db", auto_upgrade_schema=True
-    )
+        self.storage = SqliteStorage(
+            table_name="agent_sessions", db_file="sqlite.db", auto_upgrade_schema=True
+        )
 
-    # Configuration de l'outil d'email
-    email_tool = EmailTool()
-    
-    return Agent(
-        model=Gemini(api_key=gemini_api_key),
-        storage=storage,
-        knowledge=cvs_base, 
-        tools=[email_tool],       
-        add_datetime_to_instructions=True,
-        read_chat_history=True,
-        add_history_to_messages=True,
-        read_tool_call_history=True,
-        update_knowledge=True,
-        search_knowledge=True,
-        instructions=[
-            "Répondez uniquement en français.",
-            "Se contenter uniquement des données de la base de connaissances.",
-            "Ne pas effectuer de recherche sur internet.",
-            "Afficher le résultat en tableau.",
-            "RECHERCHE OBLIGATOIRE: TOUJOURS effectuer des recherches dans la base de connaissances avant de répondre.",
-            "IMPORTANT: Utilisez UNIQUEMENT les outils de recherche intégrés d'Agno, ne pas utiliser 'default_api' ou 'print()'.",
-            "Pour effectuer une recherche, utilisez directement les capacités de l'agent sans appeler d'API externe.",
-            "Pour toute demande d'information, faire AU MOINS une recherche avec les mots-clés pertinents.",
-            "Si une première recherche ne donne pas de résultats, essayer avec des mots-clés alternatifs.",
-            "Ne JAMAIS répondre 'Je n'ai pas cette information' sans avoir fait de recherches.",
-            "IMPORTANT: Pour rechercher dans la base de connaissances, utiliser les fonctionnalités intégrées de l'agent sans appeler de fonctions externes.",
-            "INTERDICTION: Ne JAMAIS utiliser 'print()', 'default_api', ou toute autre fonction externe pour la recherche.",
-            "RECHERCHE CORRECTE: Quand un utilisateur demande des informations, répondez directement en utilisant la base de connaissances intégrée sans générer de code tool_call.",
-            "FORMAT DE RÉPONSE: Répondez DIRECTEMENT avec les informations trouvées sous forme de tableau markdown, sans générer de code ou de tool_call.",
-            "INTERDICTION ABSOLUE: Ne JAMAIS générer de code Python, de tool_call, ou d'appel à default_api dans la réponse.",
-            "DÉDUPLICATION OBLIGATOIRE: Ne jamais afficher plusieurs fois le même candidat/CV.",
-            "Si un même nom apparaît plusieurs fois avec des dates de réception différentes, ne garder que la version la plus récente.",
-            "Identifier les doublons par le nom complet du candidat et ne présenter qu'une seule entrée par personne.",
-            "RECHERCHE PAR CRITÈRES MULTIPLES:",
-            "- Pour les recherches par lieu ET expérience, effectuer plusieurs recherches complémentaires",
-            "- Rechercher d'abord par lieu (ex: 'Marrakech', 'Casablanca', 'Rabat', etc.)",
-            "- Puis filtrer les résultats par expérience (chercher 'ANS', 'années', 'expérience', etc.)",
-            "- Pour l'expérience, rechercher des patterns comme: '5 ANS', '6 ans', 'plus de 5', 'années d'expérience'",
-            "Distinguer clairement les informations des CV et les informations de suivi de candidature.",
-            "Pour les résultats contenant 'status:' dans le document, créer une section 'Suivi de candidature'.",
-            "Pour les CV, créer une section 'Contenu du CV' et afficher le texte du CV.",
-            "Afficher le nom du CV comme un lien Markdown : '[nom du cv](./app/static/cvs/[nom du cv])'",
-            "Pour chaque ajout dans la base de connaissances, ajoute : 'DATE MAJ = [maintenant]'",
-            "Ne pas montrer la colonne 'DATE MAJ' si ce n'est pas demandé",
-            "Pour la colonne 'VISIO', afficher 'https://wa.me/[Tél]'. Supprimer les espaces de [Tél] et si le num commence avec '06' remplacer par '2126' et '07' par '2127'.",
-            "Ne pas montrer la colonne 'Tél' si ce n'est pas demandé",
-            "Ne pas montrer la colonne 'VISIO' si ce n'est pas demandé",            "IMPORTANT: Chaque CV contient une date de réception au début du texte au format 'Date de réception : JJ/MM/AAAA à HH:MM'. Utiliser cette information pour filtrer les CV par date de réception.",            "RECHERCHE PAR DATE - RÈGLES SPÉCIFIQUES:",
-            "- PROBLÈME TECHNIQUE: La recherche avec deux-points ':' cause des erreurs de syntaxe",
-            "- SOLUTION: Pour rechercher par date, utiliser plusieurs stratégies de recherche:",
-            "- STRATÉGIE 1: Rechercher la date exacte au format demandé",
-            "- STRATÉGIE 2: Rechercher avec différents formats de date (avec/sans zéros initiaux)",
-            "- STRATÉGIE 3: Rechercher par composants (mois/année, année seule)",
-            "- STRATÉGIE 4: Rechercher des termes associés avec 'réception' ou 'reçu'",
-            "- STRATÉGIE 5: Si aucun résultat, rechercher des mots-clés du mois en français",
-            "- TOUJOURS effectuer AU MOINS 3-4 recherches différentes avant de conclure qu'il n'y a pas de CV",
-            "- Formats de date à essayer OBLIGATOIREMENT: 'JJ/MM/AAAA', 'J/MM/AAAA', 'JJ/M/AAAA', 'J/M/AAAA', 'JJ/MM/AA'",
-            "- Si aucun résultat après TOUTES ces tentatives, indiquer 'Aucun CV reçu le [date demandée]'",
-            "Analyser le contenu complet des CV pour extraire toutes les informations pertinentes même si elles contiennent des caractères spéciaux comme les deux-points.",
-           "ENVOI D'EMAIL - FONCTIONNALITÉ:",
-            "- Vous pouvez envoyer des emails aux candidats en utilisant l'outil email.",
-            "- Pour envoyer un email, utilisez la fonction send_email avec les paramètres : destinataire, sujet, contenu.",
-            "- Personnalisez toujours le contenu de l'email avec les informations du candidat trouvées dans la base.",
-            "- Demandez confirmation avant d'envoyer un email.",
-            "- Formats d'email supportés : entretien, refus, demande d'information, convocation.",
-    
-        ],
-        show_tool_calls=False,  # Désactiver l'affichage des tool_calls pour éviter la génération de code
-    )
+        # Un seul client HTTP Gemini pour tous les agents
+        self.gemini_client = Gemini(api_key=self.gemini_api_key).get_client()
+        self.instructions = agent_instructions
+        self.created = 0
+
+    def create(self, session_id=None, user_id=None):
+        """Agent léger lié à une session et à un utilisateur"""
+        self.created += 1
+        return Agent(
+            model=Gemini(api_key=self.gemini_api_key, client=self.gemini_client),
+            storage=self.storage,
+            knowledge=self.knowledge,
+            session_id=session_id,
+            user_id=user_id,
+            # Outils propres à l'agent : agno lie leurs fonctions à l'agent qui les enregistre
+            tools=[EmailTool(), CvSearchTool(self.vector_db)],
+            add_datetime_to_instructions=True,
+            read_chat_history=True,
+            add_history_to_messages=True,
+            read_tool_call_history=True,
+            update_knowledge=True,
+            search_knowledge=True,
+            # Les questions avec date, ville ou expérience sont planifiées et filtrées avant le premier appel au modèle
+            retriever=cv_retriever,
+            add_references=True,
+            instructions=self.instructions,
+            show_tool_calls=False,  # Désactiver l'affichage des tool_calls pour éviter la génération de code
+        )
+
+    def record_exchange(self, session_id, user_id, message, answer):
+        """Enregistre dans la session une question et une réponse servies sans exécuter l'agent
+        (cache de réponses, demande identique regroupée) : l'historique des chats est lu dans agent_sessions"""
+        agent = self.create(session_id=session_id, user_id=user_id)
+        agent.initialize_agent()
+        agent.read_from_storage()
+        question = Message(role="user", content=message)
+        reply = Message(role="assistant", content=answer)
+        agent.memory.add_messages(messages=[question, reply])
+        agent.memory.add_run(AgentRun(
+            message=question,
+            response=RunResponse(
+                content=answer, messages=[question, reply], agent_id=agent.agent_id, session_id=session_id
+            ),
+        ))
+        agent.write_to_storage()
+
+
+# Composants partagés, construits une seule fois
+agent_factory = AgentFactory()
+
+
+def create_agent(session_id=None, user_id=None):
+    """Crée et configure l'agent d'IA"""
+    return agent_factory.create(session_id=session_id, user_id=user_id)
 
 
-# Instanciation de l'agent
-agent = create_agent()
\ No newline at end of file
+# Instanciation de l'agent (interface Streamlit, mono-utilisateur)
+agent = create_agent()
@@ -1,12 +1,14 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
+import asyncio
 import json
 import os
-from datetime import datetime
+from datetime import date, datetime
+import time
 import uvicorn
 
 # Import de l'agent seulement quand nécessaire
@@ -23,27 +25,31 @@ from auth.user_auth import verify_user_credentials, load_users, save_users, gene
 # Import des utilitaires d'historique
 from chat_history_utils import chat_history_manager, ChatSession, ChatMessage
 
-# Variables globales pour l'agent
-agent = None
+# File d'exécution de l'agent (appels bloquants hors de la boucle d'événements)
+from utils.agent_queue import agent_queue, AgentQueueFull
+
+# Variables globales pour l'agent : la fabrique partage les composants coûteux,
+# chaque requête reçoit son propre agent lié à sa session
+agent_factory = None
 agent_ready = False
 
 def initialize_agent():
-    """Initialise l'agent seulement quand nécessaire"""
-    global agent, agent_ready
-    if agent is None:
+    """Initialise la fabrique d'agents seulement quand nécessaire"""
+    global agent_factory, agent_ready
+    if agent_factory is None:
         try:
-            from agent import agent as _agent, as_text, as_stream
-            agent = _agent
+            from agent import agent_factory as _agent_factory, as_text, as_stream
+            agent_factory = _agent_factory
             agent_ready = True
             print("✅ Agent initialisé avec succès")
-            return _agent, as_text, as_stream
+            return _agent_factory, as_text, as_stream
         except Exception as e:
             print(f"❌ Erreur lors de l'initialisation de l'agent: {e}")
             agent_ready = False
             return None, None, None
     else:
         from agent import as_text, as_stream
-        return agent, as_text, as_stream
+        return agent_factory, as_text, as_stream
 
 app = FastAPI(title="Agent RH CTM API", version="1.0.0")
 
@@ -86,6 +92,8 @@ class ChatResponse(BaseModel):
     response: str
     chat_id: str
     timestamp: str
+    cached: bool = False
+    coalesced: bool = False
 
 class UserInfo(BaseModel):
     email: str
@@ -195,10 +203,42 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
     """Récupère les informations de l'utilisateur actuel"""
     return UserInfo(**current_user)
 
+def is_new_conversation(chat_id):
+    """Une question sans historique ne dépend pas des échanges précédents"""
+    return not chat_id or not chat_history_manager.get_session_messages(chat_id)
+
+def answer_cache_key(vector_db, message):
+    """Portée et embedding d'une question pour le cache de réponses"""
+    from utils.answer_cache import normalize_question, question_scope
+    from utils.retrieval_cache import get_retrieval_cache
+
+    scope = question_scope(message, vector_db.table.version)
+    embedding = get_retrieval_cache().query_embedding(vector_db.embedder, normalize_question(message))
+    return scope, embedding
+
+def start_search_prefetch(current_agent, message):
+    """Lance la recherche sur la question brute pendant le premier appel au modèle"""
+    from utils.query_utils import plan_query
+    from utils.search_prefetch import search_prefetcher
+
+    # Une question avec filtres est déjà recherchée avant le premier appel (planificateur)
+    if plan_query(message).has_filters:
+        return
+    knowledge = current_agent.knowledge
+    search_prefetcher.start(knowledge.vector_db, message, knowledge.num_documents)
+
+def record_shared_answer(factory, chat_id, user_id, message, answer):
+    """Enregistre dans la session d'un chat la réponse d'une exécution partagée avec une autre demande"""
+    try:
+        factory.record_exchange(chat_id, user_id, message, answer)
+    except Exception as e:
+        print(f"[API] Historique du chat {chat_id} non enregistré: {str(e)}")
+
 @app.post("/api/chat/message", response_model=ChatResponse)
 async def send_message(
     chat_data: ChatMessage, 
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    x_answer_cache: Optional[str] = Header(None)
 ):
     """Endpoint pour envoyer un message à l'agent"""
     try:
@@ -208,41 +248,111 @@ async def send_message(
         # Créer un ID de chat si non fourni
         chat_id = chat_data.chat_id or f"chat_{datetime.now().timestamp()}"
         # Initialiser l'agent si nécessaire
-        current_agent, as_text_func, as_stream_func = initialize_agent()
-        if not current_agent:
+        factory, as_text_func, as_stream_func = initialize_agent()
+        if not factory:
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="Agent non disponible"
             )
         
-        # Configurer l'agent avec l'ID utilisateur pour la session
-        session_config = {
-            "session_id": chat_id,
-            "user_id": current_user['email']
-        }
+        # Cache sémantique des réponses : questions sans action, posées en début de conversation.
+        # L'en-tête "X-Answer-Cache: bypass" force un appel à l'agent (la réponse est tout de même mise en cache).
+        from utils.answer_cache import answer_cache, is_cacheable
+        from utils.singleflight import singleflight, singleflight_key
+        cache_scope = cache_embedding = flight_key = None
+        if is_cacheable(chat_data.message) and is_new_conversation(chat_data.chat_id):
+            try:
+                cache_scope, cache_embedding = await asyncio.to_thread(
+                    answer_cache_key, factory.vector_db, chat_data.message
+                )
+                if (x_answer_cache or "").lower() in ("bypass", "no-cache", "off"):
+                    answer_cache.record_bypass()
+                else:
+                    cached = answer_cache.lookup(cache_scope, cache_embedding)
+                    if cached:
+                        print(f"[API] Réponse servie depuis le cache (similarité {cached['similarity']:.3f}, "
+                              f"{cached['seconds']:.1f}s économisées)")
+                        # La question et la réponse sont ajoutées à la session pour l'historique du chat
+                        await asyncio.to_thread(
+                            factory.record_exchange, chat_id, current_user['email'], chat_data.message, cached["answer"]
+                        )
+                        return ChatResponse(
+                            response=cached["answer"],
+                            chat_id=chat_id,
+                            timestamp=datetime.now().isoformat(),
+                            cached=True
+                        )
+            except Exception as e:
+                print(f"[API] Cache de réponses indisponible: {str(e)}")
+                cache_scope = None
+            try:
+                flight_key = await asyncio.to_thread(singleflight_key, factory.vector_db, chat_data.message)
+            except Exception as e:
+                print(f"[API] Regroupement des demandes indisponible: {str(e)}")
         
-        # Appeler votre agent avec le message
-        response_chunks = current_agent.run(
-            chat_data.message, 
-            stream=False,
-            session_id=chat_id
-        )
+        # Appeler votre agent avec le message, la recherche probable étant préchargée en parallèle
+        from utils.cv_retriever import set_user_message
+        from utils.search_prefetch import search_prefetcher
         
-        # Convertir la réponse en texte
-        response_text = as_text_func(response_chunks)
+        async def run_agent():
+            # Agent propre à la requête, lié à la session et à l'utilisateur : créé seulement
+            # pour la demande qui exécute réellement l'agent
+            current_agent = factory.create(session_id=chat_id, user_id=current_user['email'])
+            set_user_message(current_agent, chat_data.message)
+            start_search_prefetch(current_agent, chat_data.message)
+            try:
+                response_chunks = await agent_queue.run(
+                    current_agent.run,
+                    chat_data.message, 
+                    stream=False,
+                    session_id=chat_id
+                )
+            finally:
+                search_prefetcher.finish(chat_data.message)
+            
+            # Convertir la réponse en texte
+            return as_text_func(response_chunks)
+        
+        started_at = time.perf_counter()
+        coalesced = False
+        if flight_key is not None:
+            # Une demande identique déjà en cours est rejointe au lieu de relancer l'agent
+            response_text, coalesced = await singleflight.run(flight_key, run_agent)
+            if coalesced:
+                print(f"[API] Demande identique en cours rejointe ({time.perf_counter() - started_at:.1f}s d'attente)")
+        else:
+            response_text = await run_agent()
         
         # Si pas de réponse, message par défaut
         if not response_text.strip():
             response_text = "Je n'ai pas pu traiter votre demande. Veuillez réessayer."
+        elif coalesced:
+            # L'agent n'a tourné que dans la session de la première demande : la question et
+            # la réponse partagée sont ajoutées à l'historique de ce chat
+            await asyncio.to_thread(
+                record_shared_answer, factory, chat_id, current_user['email'], chat_data.message, response_text
+            )
+        elif cache_scope is not None and not coalesced and not response_text.startswith("❌"):
+            answer_cache.store(cache_scope, cache_embedding, chat_data.message, response_text,
+                               time.perf_counter() - started_at)
         
         print(f"[API] Réponse générée: {response_text[:100]}...")
         
         return ChatResponse(
             response=response_text,
             chat_id=chat_id,
-            timestamp=datetime.now().isoformat()
+            timestamp=datetime.now().isoformat(),
+            coalesced=coalesced
         )
         
+    except AgentQueueFull as e:
+        print(f"[API] File de l'agent saturée: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Trop de demandes en cours, veuillez réessayer dans un instant"
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[API] Erreur lors du traitement du message: {str(e)}")
         raise HTTPException(
@@ -250,52 +360,119 @@ async def send_message(
             detail=f"Erreur lors du traitement du message: {str(e)}"
         )
 
+async def generate_agent_stream(chat_id, message, current_user, slot):
+    """Génère les morceaux de réponse de l'agent en streaming asynchrone"""
+    from agent import as_async_stream
+    from utils.cv_retriever import prepare_references, set_user_message
+    from utils.search_prefetch import search_prefetcher
+
+    try:
+        # Initialiser l'agent si nécessaire
+        factory, _, _ = initialize_agent()
+        if not factory:
+            raise RuntimeError("Agent non disponible")
+        # Agent propre à la requête, lié à la session et à l'utilisateur
+        current_agent = factory.create(session_id=chat_id, user_id=current_user['email'])
+        
+        # Appeler votre agent avec streaming et l'ID de session, la recherche probable étant préchargée
+        set_user_message(current_agent, message)
+        start_search_prefetch(current_agent, message)
+        try:
+            # Recherche de la question faite dans un thread : le retriever appelé par arun est synchrone
+            await asyncio.to_thread(prepare_references, current_agent)
+            response_chunks = await current_agent.arun(
+                message, 
+                stream=True,
+                session_id=chat_id
+            )
+            async for chunk in as_async_stream(response_chunks):
+                if chunk:
+                    yield chunk
+        finally:
+            search_prefetcher.finish(message)
+    finally:
+        slot.release()
+
 @app.post("/api/chat/stream")
 async def send_message_stream(
     chat_data: ChatMessage, 
-    current_user: dict = Depends(get_current_user)
+    request: Request,
+    current_user: dict = Depends(get_current_user),
+    last_event_id: Optional[str] = Header(None)
 ):
-    """Endpoint pour envoyer un message à l'agent avec streaming"""
+    """Endpoint pour envoyer un message à l'agent avec streaming.
+
+    Chaque événement porte un id ; une reconnexion avec l'en-tête Last-Event-ID sur le même
+    chat rejoue les événements manquants puis suit la génération encore en cours.
+    """
     try:
         from fastapi.responses import StreamingResponse
+        from utils.sse_stream import stream_registry
         
         # Créer un ID de chat si non fourni
         chat_id = chat_data.chat_id or f"chat_{datetime.now().timestamp()}"
         
-        def generate_response():
-            try:
-                # Initialiser l'agent si nécessaire
-                current_agent, as_text_func, as_stream_func = initialize_agent()
-                if not current_agent:
-                    yield f"data: {json.dumps({'error': 'Agent non disponible'})}\n\n"
-                    return
+        # Reprise d'une génération interrompue côté client
+        resumed = None
+        if last_event_id and chat_data.chat_id:
+            resumed = stream_registry.resume(chat_id, current_user['email'], last_event_id)
+        if resumed:
+            stream_buffer, position = resumed
+            print(f"[API] Reprise du flux {chat_id} après l'événement {last_event_id}")
+        else:
+            # Une génération identique déjà en cours (nouvelle conversation, même question,
+            # même base, même jour) est suivie depuis le début au lieu de relancer l'agent
+            from utils.answer_cache import is_cacheable
+            from utils.singleflight import singleflight, singleflight_key
+            flight_key = stream_buffer = None
+            factory, _, _ = initialize_agent()
+            if factory and is_cacheable(chat_data.message) and is_new_conversation(chat_data.chat_id):
+                try:
+                    flight_key = await asyncio.to_thread(singleflight_key, factory.vector_db, chat_data.message)
+                    stream_buffer = singleflight.join_stream(flight_key)
+                except Exception as e:
+                    print(f"[API] Regroupement des demandes indisponible: {str(e)}")
+            if stream_buffer is not None:
+                stream_registry.attach(chat_id, current_user['email'], stream_buffer)
+                print(f"[API] Génération identique en cours rejointe par {chat_id}")
                 
-                # Appeler votre agent avec streaming et l'ID de session
-                response_chunks = current_agent.run(
-                    chat_data.message, 
-                    stream=True,
-                    session_id=chat_id
+                # La réponse partagée est ajoutée à l'historique de ce chat à la fin de la génération
+                def record_when_done(task, stream_buffer=stream_buffer, message=chat_data.message):
+                    answer = stream_buffer.answer()
+                    if answer:
+                        asyncio.get_running_loop().run_in_executor(
+                            None, record_shared_answer, factory, chat_id, current_user['email'], message, answer
+                        )
+                stream_buffer.task.add_done_callback(record_when_done)
+            else:
+                # Place réservée dans la file de l'agent avant de lancer la génération, libérée à sa fin
+                slot = await agent_queue.acquire()
+                stream_buffer = stream_registry.start(
+                    chat_id, current_user['email'], slot.bind(generate_agent_stream(chat_id, chat_data.message, current_user, slot))
                 )
-                
-                for chunk in as_stream_func(response_chunks):
-                    if chunk:
-                        yield f"data: {json.dumps({'content': chunk, 'chat_id': chat_id})}\n\n"
-                
-                # Signal de fin
-                yield f"data: {json.dumps({'done': True, 'chat_id': chat_id})}\n\n"
-                
-            except Exception as e:
-                yield f"data: {json.dumps({'error': str(e)})}\n\n"
+                if flight_key is not None:
+                    singleflight.lead_stream(flight_key, stream_buffer)
+            position = 0
         
+        # Le flux suit la génération, qui tourne dans sa propre tâche : une déconnexion ne
+        # l'interrompt qu'après le délai de reprise. Des commentaires de maintien sont envoyés
+        # pendant les longues attentes (outils, premier token).
         return StreamingResponse(
-            generate_response(),
+            stream_buffer.follow(position, request.is_disconnected, chat_id=chat_id),
             media_type="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
                 "Connection": "keep-alive",
+                "X-Accel-Buffering": "no",
             }
         )
         
+    except AgentQueueFull as e:
+        print(f"[API] File de l'agent saturée: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Trop de demandes en cours, veuillez réessayer dans un instant"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -338,6 +515,88 @@ async def list_cvs(current_user: dict = Depends(get_current_user)):
             detail=f"Erreur lors de la récupération des CVs: {str(e)}"
         )
 
+def search_cvs_sync(q, date_from, date_to, city, min_experience, page, page_size):
+    """Recherche hybride directe dans la table 'cvs', une entrée par candidat (meilleur passage)"""
+    from utils.cv_fields import find_city
+    from utils.cv_store import build_where
+
+    factory, _, _ = initialize_agent()
+    if not factory:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Agent non disponible"
+        )
+    vector_db = factory.vector_db
+    where = build_where(
+        date_from=date_from,
+        date_to=date_to,
+        city=(find_city(city) or city) if city else None,
+        min_experience=min_experience,
+    )
+
+    # Plusieurs passages par CV (et un éventuel suivi) : on en récupère davantage puis on regroupe par candidat
+    wanted = page * page_size + 1
+    documents = vector_db.filtered_search(q, where=where, limit=wanted * 3)
+    results = {}
+    for document in documents:
+        meta_data = document.meta_data or {}
+        source = meta_data.get("source") or document.name
+        key = meta_data.get("candidate_id") or source
+        if key in results:
+            continue
+        results[key] = {
+            "candidate_id": meta_data.get("candidate_id"),
+            "source": source,
+            "document_type": meta_data.get("document_type"),
+            "candidate_name": meta_data.get("candidate_name"),
+            "city": meta_data.get("city"),
+            "reception_date": meta_data.get("reception_date"),
+            "experience_years": meta_data.get("experience_years"),
+            "email": meta_data.get("email"),
+            "phone": meta_data.get("phone"),
+            "score": meta_data.get("score"),
+            "score_type": meta_data.get("score_type"),
+            "excerpt": (document.content or "")[:300],
+            # Fichier archivé d'origine (aucun pour une ligne de suivi Excel)
+            "url": f"/static/cvs/{meta_data['file_path']}" if meta_data.get("file_path") else None,
+        }
+    results = list(results.values())
+    start = (page - 1) * page_size
+    return results[start:start + page_size], len(results) > start + page_size, where
+
+@app.get("/api/cvs/search")
+async def search_cvs(
+    q: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    city: Optional[str] = None,
+    min_experience: Optional[float] = Query(None, ge=0),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """Recherche directe dans la base de CV, sans passer par le modèle (liste de candidats, recherches rapides)"""
+    try:
+        started_at = time.perf_counter()
+        results, has_more, where = await asyncio.to_thread(
+            search_cvs_sync, q, date_from, date_to, city, min_experience, page, page_size
+        )
+        return {
+            "results": results,
+            "page": page,
+            "page_size": page_size,
+            "has_more": has_more,
+            "filters": where,
+            "took_ms": round((time.perf_counter() - started_at) * 1000, 1)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erreur lors de la recherche de CVs: {str(e)}"
+        )
+
 @app.get("/api/cvs/{filename}")
 async def get_cv_info(filename: str, current_user: dict = Depends(get_current_user)):
     """Endpoint pour obtenir les informations d'un CV spécifique"""
@@ -676,10 +935,162 @@ async def get_chat_stats(current_user: dict = Depends(get_current_user)):
             detail=f"Erreur lors de la récupération des statistiques: {str(e)}"
         )
 
+def get_index_manager():
+    """Retourne le gestionnaire d'index de la table 'cvs' utilisée par l'agent"""
+    from utils.lancedb_index import IndexManager
+
+    factory, _, _ = initialize_agent()
+    if not factory:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Agent non disponible"
+        )
+    return IndexManager(factory.vector_db.table)
+
+@app.get("/api/admin/indexes")
+async def get_index_status(current_user: dict = Depends(get_current_user)):
+    """Récupère l'état des index vectoriel et plein texte de la base de CV"""
+    try:
+        return {
+            "success": True,
+            "indexes": get_index_manager().status()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erreur lors de la récupération de l'état des index: {str(e)}"
+        )
+
+@app.post("/api/admin/indexes/refresh")
+async def refresh_indexes(force: bool = False, current_user: dict = Depends(get_current_user)):
+    """Construit ou met à jour les index de la base de CV"""
+    try:
+        manager = get_index_manager()
+        state = await asyncio.to_thread(manager.ensure_indexes, force)
+        return {
+            "success": True,
+            "indexes": state
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erreur lors de la mise à jour des index: {str(e)}"
+        )
+
+@app.get("/api/admin/retrieval-cache")
+async def get_retrieval_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Compteurs du cache de recherche (embeddings des requêtes et résultats) et des chunks répétés"""
+    from utils.retrieval_cache import get_retrieval_cache
+    from utils.run_chunks import run_chunks
+
+    return {
+        "success": True,
+        "retrieval_cache": get_retrieval_cache().stats(),
+        "run_chunks": run_chunks.stats()
+    }
+
+@app.get("/api/admin/answer-cache")
+async def get_answer_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Compteurs du cache sémantique des réponses (succès, contournements, secondes économisées)"""
+    from utils.answer_cache import answer_cache
+
+    return {
+        "success": True,
+        "answer_cache": answer_cache.stats()
+    }
+
+@app.get("/api/admin/prefetch")
+async def get_prefetch_stats(current_user: dict = Depends(get_current_user)):
+    """Taux de réussite du préchargement des recherches"""
+    from utils.search_prefetch import search_prefetcher
+
+    return {
+        "success": True,
+        "prefetch": search_prefetcher.stats()
+    }
+
+@app.get("/api/admin/agent-queue")
+async def get_agent_queue_stats(current_user: dict = Depends(get_current_user)):
+    """Occupation de la file d'exécution de l'agent (profondeur et temps d'attente), flux SSE et demandes regroupées"""
+    from utils.singleflight import singleflight
+    from utils.sse_stream import stream_registry
+
+    return {
+        "success": True,
+        "agent_queue": agent_queue.stats(),
+        "streams": stream_registry.stats(),
+        "coalescing": singleflight.stats()
+    }
+
+# Dernier rapport de maintenance LanceDB (compactage et nettoyage des versions)
+last_maintenance_report = None
+
+def run_lancedb_maintenance():
+    """Exécute la maintenance de la table 'cvs' puis recharge la table utilisée par l'agent"""
+    global last_maintenance_report
+    from utils.lancedb_index import IndexManager
+    from utils.lancedb_maintenance import run_maintenance
+
+    last_maintenance_report = run_maintenance()
+    if agent_factory is not None:
+        # La table partagée par les agents doit voir la version compactée
+        IndexManager(agent_factory.vector_db.table).refresh_table()
+    return last_maintenance_report
+
+async def lancedb_maintenance_loop(interval_hours: float):
+    """Planifie la maintenance LanceDB à intervalle régulier"""
+    while True:
+        await asyncio.sleep(interval_hours * 3600)
+        try:
+            await asyncio.to_thread(run_lancedb_maintenance)
+        except Exception as e:
+            print(f"❌ Erreur lors de la maintenance LanceDB: {e}")
+
+@app.on_event("startup")
+async def schedule_lancedb_maintenance():
+    """Démarre la maintenance périodique (désactivée si l'intervalle vaut 0)"""
+    from utils.lancedb_maintenance import maintenance_interval_hours
+
+    if maintenance_interval_hours > 0:
+        asyncio.create_task(lancedb_maintenance_loop(maintenance_interval_hours))
+        print(f"🧹 Maintenance LanceDB planifiée toutes les {maintenance_interval_hours:g}h")
+
+@app.get("/api/admin/maintenance")
+async def get_maintenance_report(current_user: dict = Depends(get_current_user)):
+    """Récupère le dernier rapport de maintenance de la base de CV"""
+    return {
+        "success": True,
+        "report": last_maintenance_report
+    }
+
+@app.post("/api/admin/maintenance")
+async def trigger_maintenance(current_user: dict = Depends(get_current_user)):
+    """Lance immédiatement la maintenance de la base de CV"""
+    try:
+        report = await asyncio.to_thread(run_lancedb_maintenance)
+        return {
+            "success": True,
+            "report": report
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erreur lors de la maintenance: {str(e)}"
+        )
+
 @app.get("/api/health")
 async def health_check():
     """Endpoint de vérification de santé"""
     global agent_ready
+    from utils.lancedb_index import IndexManager
+
+    # Lecture du dernier état enregistré uniquement (pas d'accès à la table)
+    index_state = IndexManager(None).load_state()
+    queue_stats = agent_queue.stats()
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
@@ -688,6 +1099,16 @@ async def health_check():
             "authentication": True,
             "registration": True,
             "agent_chat": agent_ready
+        },
+        "knowledge_indexes": {
+            "rows": index_state.get("rows"),
+            "checked_at": index_state.get("checked_at"),
+            "vector_index": bool(index_state.get("vector", {}).get("built_at")),
+            "fts_index": bool(index_state.get("fts", {}).get("built_at"))
+        },
+        "agent_queue": {
+            "running": queue_stats["running"],
+            "queue_depth": queue_stats["queue_depth"]
         }
     }
 
@@ -1,10 +1,20 @@
 import sqlite3
 import json
 import os
+import re
 from datetime import datetime
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
 
+# Références de la base de connaissances ajoutées par l'agent au message utilisateur
+references_pattern = re.compile(r"\s*Use the following references from the knowledge base if it helps:\s*<references>.*?</references>", re.DOTALL)
+
+
+def strip_references(content):
+    """Retire le bloc de références injecté dans le message pour n'afficher que la question"""
+    return references_pattern.sub("", content) if isinstance(content, str) else content
+
+
 @dataclass
 class ChatMessage:
     """Représente un message de chat"""
@@ -81,14 +91,14 @@ class ChatHistoryManager:
                                 # Générer un titre basé sur le premier message de l'utilisateur
                                 for msg in messages:
                                     if msg.get('role') == 'user' and msg.get('content'):
-                                        content = msg['content']
+                                        content = strip_references(msg['content'])
                                         title = content[:50] + "..." if len(content) > 50 else content
                                         break
                                 
                                 # Récupérer le dernier message
                                 if messages:
                                     last_msg = messages[-1]
-                                    last_message = last_msg.get('content', '')[:100]
+                                    last_message = (strip_references(last_msg.get('content')) or '')[:100]
                         except (json.JSONDecodeError, KeyError):
                             pass
                     
@@ -142,6 +152,8 @@ class ChatHistoryManager:
                             elif isinstance(part, str):
                                 text_parts.append(part)
                         content = ' '.join(text_parts)
+                    if role == 'user':
+                        content = strip_references(content)
                     
                     # Timestamp - utiliser celui du message s'il existe, sinon timestamp actuel
                     timestamp = msg.get('timestamp', datetime.now().isoformat())
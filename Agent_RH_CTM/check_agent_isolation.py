@@ -0,0 +1,93 @@
+import argparse
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from agent import agent_factory, as_text
+from utils.cv_retriever import set_user_message
+
+
+def run_session(index, marker):
+    """Une conversation complète sur son propre agent, avec une question marquée"""
+    session_id = f"isolation_{marker}"
+    user_id = f"controle{index}@ctm.ma"
+    question = f"Quels sont les derniers CV reçus ? (référence de contrôle {marker})"
+    agent = agent_factory.create(session_id=session_id, user_id=user_id)
+    started_at = time.perf_counter()
+    set_user_message(agent, question)
+    response = agent.run(question, stream=False, session_id=session_id)
+    return {
+        "session_id": session_id,
+        "user_id": user_id,
+        "marker": marker,
+        "agent": agent,
+        "answer": as_text(response),
+        "seconds": time.perf_counter() - started_at,
+    }
+
+
+def check_session(result, markers):
+    """Vérifie qu'une session ne contient que sa propre question et son propre état"""
+    problems = []
+    agent = result["agent"]
+    if agent.session_id != result["session_id"] or agent.user_id != result["user_id"]:
+        problems.append("agent rattaché à une autre session")
+
+    search_tool = next(tool for tool in agent.tools if tool.name == "cv_search_tool")
+    bound_agent = search_tool.functions["search_cvs_multi"]._agent
+    if bound_agent is not None and bound_agent is not agent:
+        problems.append("outil de recherche lié à un autre agent")
+
+    stored = agent_factory.storage.read(session_id=result["session_id"])
+    if stored is None:
+        return problems + ["session absente du stockage"]
+    if stored.user_id != result["user_id"]:
+        problems.append(f"utilisateur enregistré {stored.user_id}")
+    content = json.dumps({"memory": stored.memory, "session_data": stored.session_data}, ensure_ascii=False, default=str)
+    if result["marker"] not in content:
+        problems.append("question absente de l'historique")
+    leaked = [marker for marker in markers if marker != result["marker"] and marker in content]
+    if leaked:
+        problems.append(f"questions d'autres sessions présentes: {', '.join(leaked)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Contrôle d'isolation des sessions sous charge parallèle")
+    parser.add_argument("--sessions", type=int, default=20, help="Nombre de conversations simultanées")
+    parser.add_argument("--keep", action="store_true", help="Conserver les sessions de contrôle dans sqlite.db")
+    args = parser.parse_args()
+
+    markers = [uuid.uuid4().hex[:10] for _ in range(args.sessions)]
+    print(f"🚀 {args.sessions} conversation(s) en parallèle...")
+    started_at = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        futures = [executor.submit(run_session, index, marker) for index, marker in enumerate(markers)]
+    results, failures = [], 0
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            failures += 1
+            print(f"❌ Conversation en échec: {str(e)}")
+    elapsed = time.perf_counter() - started_at
+
+    leaks = 0
+    for result in results:
+        problems = check_session(result, markers)
+        if problems:
+            leaks += 1
+            print(f"❌ {result['session_id']}: {'; '.join(problems)}")
+        if not args.keep:
+            agent_factory.storage.delete_session(result["session_id"])
+
+    slowest = max((result["seconds"] for result in results), default=0.0)
+    print(f"⏱️ {elapsed:.1f}s au total, {slowest:.1f}s pour la conversation la plus lente")
+    if leaks or failures:
+        print(f"❌ {leaks} session(s) avec fuite, {failures} conversation(s) en échec")
+        raise SystemExit(1)
+    print(f"✅ {len(results)} session(s) isolées, aucune fuite entre conversations")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from datetime import date
+from types import SimpleNamespace
+from utils.candidate_scratchpad import resolve_follow_up, store_items
+from utils.query_utils import plan_query
+
+# Date fixe : les périodes relatives ("30 derniers jours") restent reproductibles
+today = date(2025, 6, 15)
+
+# Question -> attributs attendus du plan
+planner_cases = [
+    ("Chauffeurs à Casablanca", {"city": "Casablanca", "job_titles": ["chauffeur"]}),
+    ("CV reçus en mars 2025", {"date_from": date(2025, 3, 1), "date_to": date(2025, 3, 31)}),
+    ("CV reçus les 30 derniers jours", {"date_from": date(2025, 5, 16), "date_to": today}),
+    ("Candidats avec plus de 5 ans d'expérience", {"min_experience": 5.0, "max_experience": None}),
+    ("Candidats avec 5 ans d'expérience à Rabat", {"min_experience": 5.0, "city": "Rabat"}),
+    ("Entre 3 et 6 ans d'expérience", {"min_experience": 3.0, "max_experience": 6.0}),
+    ("Au moins 2 ans et au plus 8 ans d'expérience", {"min_experience": 2.0, "max_experience": 8.0}),
+    # Les années d'un maximum ne deviennent pas aussi un minimum
+    ("Chauffeur avec moins de 5 ans d'expérience", {"min_experience": None, "max_experience": 5.0}),
+    ("Pas plus de 4 ans d'expérience", {"min_experience": None, "max_experience": 4.0}),
+]
+
+# Candidats de la réponse précédente ("Chauffeurs avec plus de 3 ans d'expérience")
+previous_candidates = [
+    {"candidate_id": "cand_rabat", "candidate_name": "Youssef Alami", "city": "Rabat", "experience_years": 7.0},
+    {"candidate_id": "cand_casa", "candidate_name": "Karim Bennani", "city": "Casablanca", "experience_years": 4.0},
+]
+# Question de suivi -> candidats retenus depuis la session (None : nouvelle recherche)
+follow_up_cases = [
+    ("Et ceux de Rabat ?", ["cand_rabat"]),
+    ("Et à Casablanca ?", ["cand_casa"]),
+    ("Et pour plus de 5 ans ?", ["cand_rabat"]),
+    ("Parmi eux, ceux de Casablanca", ["cand_casa"]),
+    ("Le deuxième", ["cand_casa"]),
+    ("Envoie-leur un email", ["cand_rabat", "cand_casa"]),
+    ("Mécaniciens à Rabat", None),
+]
+
+
+def check_plan(question, expected):
+    """Retourne la liste des écarts entre le plan obtenu et le plan attendu"""
+    plan = plan_query(question, today=today)
+    return [
+        f"{name}={getattr(plan, name)!r} (attendu {value!r})"
+        for name, value in expected.items()
+        if getattr(plan, name) != value
+    ]
+
+
+def check_follow_up(question, expected):
+    """Retourne l'écart entre les candidats retenus depuis la session et ceux attendus, ou None"""
+    agent = SimpleNamespace(session_state=None)
+    store_items(agent, "Chauffeurs avec plus de 3 ans d'expérience", previous_candidates, "poste = chauffeur")
+    resolved = resolve_follow_up(agent, question)
+    selected = [item["candidate_id"] for item in resolved[1]] if resolved else None
+    return None if selected == expected else f"{selected!r} (attendu {expected!r})"
+
+
+def main():
+    failures = 0
+    for question, expected in planner_cases:
+        problems = check_plan(question, expected)
+        if problems:
+            failures += 1
+            print(f"❌ {question}: {'; '.join(problems)}")
+    for question, expected in follow_up_cases:
+        problem = check_follow_up(question, expected)
+        if problem:
+            failures += 1
+            print(f"❌ {question}: {problem}")
+    total = len(planner_cases) + len(follow_up_cases)
+    if failures:
+        print(f"❌ {failures} question(s) mal planifiée(s) sur {total}")
+        raise SystemExit(1)
+    print(f"✅ {total} question(s) planifiées comme attendu")
+
+
+if __name__ == "__main__":
+    main()
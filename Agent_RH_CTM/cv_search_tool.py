@@ -0,0 +1,90 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from agno.tools import Toolkit
+from utils.candidate_scratchpad import remember_candidates
+from utils.cv_retriever import planned_search
+from utils.env_config import get_config
+from utils.run_chunks import run_chunks
+
+# Limites de la recherche multi-requêtes
+max_queries = int(get_config("CV_SEARCH_MAX_QUERIES", "8"))
+search_workers = int(get_config("CV_SEARCH_WORKERS", "4"))
+# Constante de la fusion par rang réciproque (Reciprocal Rank Fusion)
+rrf_k = 60
+
+# Pool partagé par les outils de tous les agents (un outil par agent)
+search_executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="cv-search")
+
+
+class CvSearchTool(Toolkit):
+    """Recherche dans la table des CV avec plusieurs requêtes exécutées en parallèle"""
+
+    def __init__(self, vector_db):
+        super().__init__(name="cv_search_tool")
+        self.vector_db = vector_db
+        self.executor = search_executor
+        self.register(self.search_cvs_multi)
+
+    def run_query(self, query: str, num_documents: int):
+        """Une requête : planifiée si elle contient des filtres, hybride sinon"""
+        plan, documents = planned_search(self.vector_db, query)
+        if documents is None:
+            documents = self.vector_db.search(query, limit=num_documents)
+        return documents
+
+    def search_cvs_multi(self, queries: List[str], num_documents: int = 5, agent=None) -> str:
+        """
+        Recherche dans la base des CV avec plusieurs requêtes en un seul appel.
+        Utiliser cet outil pour essayer d'un coup plusieurs formulations : formats de date
+        ('27/08/2024', '27/8/2024', 'août 2024'), synonymes de poste ou mots-clés alternatifs.
+
+        Args:
+            queries: Liste des requêtes à exécuter (8 au maximum)
+            num_documents: Nombre de résultats par requête
+
+        Returns:
+            JSON avec les résultats fusionnés et dédupliqués
+        """
+        queries = [query.strip() for query in queries if query and query.strip()]
+        queries = list(dict.fromkeys(queries))[:max_queries]
+        if not queries:
+            return json.dumps({"error": "Aucune requête fournie"}, ensure_ascii=False)
+
+        started_at = time.perf_counter()
+        futures = {query: self.executor.submit(self.run_query, query, num_documents) for query in queries}
+
+        merged = {}
+        errors = {}
+        for query, future in futures.items():
+            try:
+                documents = future.result()
+            except Exception as e:
+                errors[query] = str(e)
+                continue
+            for rank, document in enumerate(documents):
+                key = document.id or f"{document.name}:{hash(document.content)}"
+                entry = merged.get(key)
+                if entry is None:
+                    entry = merged[key] = {"document": document.to_dict(), "score": 0.0, "queries": []}
+                entry["score"] += 1.0 / (rrf_k + rank + 1)
+                entry["queries"].append(query)
+
+        results = sorted(merged.values(), key=lambda entry: entry["score"], reverse=True)
+        documents = [entry["document"] for entry in results]
+        if agent is not None:
+            # Candidats gardés dans la session pour les questions de suivi
+            remember_candidates(agent, " | ".join(queries), documents)
+            # Chunks déjà fournis plus tôt dans le run : simple renvoi à leur référence
+            documents = run_chunks.filter(agent.run_id, documents)
+        print(f"🔎 Recherche multi-requêtes: {len(queries)} requête(s), {len(results)} résultat(s) unique(s) "
+              f"en {(time.perf_counter() - started_at) * 1000:.0f} ms")
+        return json.dumps({
+            "queries": queries,
+            "results": [
+                {**document, "score": round(entry["score"], 5), "matched_queries": entry["queries"]}
+                for document, entry in zip(documents, results)
+            ],
+            "errors": errors,
+        }, ensure_ascii=False, default=str)
@@ -1,6 +1,7 @@
 import streamlit as st
 from auth.user_auth import handle_login, handle_register, handle_activation, handle_set_password, handle_logout, load_users
 from agent import as_stream
+from utils.cv_retriever import set_user_message
 import base64
 from pathlib import Path
 import time
@@ -212,6 +213,7 @@ def display_chat_ui(agent):
                     jitter = random.uniform(0.8, 1.2) 
                     retry_delay = base_delay * (2 ** attempt) * jitter
                     
+                    set_user_message(agent, prompt)
                     chunks = agent.run(prompt, stream=True)
                     response = st.write_stream(as_stream(chunks))
                     
@@ -1,16 +1,29 @@
 from pathlib import Path
 import os
 import shutil
+import argparse
+import hashlib
+import json
+import threading
+import time
 import pandas as pd
 from datetime import datetime
 import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from agno.agent import Agent
 from agno.media import File
 from agno.models.google import Gemini
-from utils.env_config import GEMINI_API_KEY
+from utils.env_config import GEMINI_API_KEY, get_config
+from utils.rate_limiter import TokenBucket
+from utils.pdf_text import local_text_or_none
+from utils.extraction_cache import ExtractionCache, file_sha256
 # Configuration
 api_key = GEMINI_API_KEY
+# Nombre de workers d'extraction en parallèle et quota de requêtes Gemini par minute
+extraction_workers = int(get_config("EXTRACTION_WORKERS", "4"))
+gemini_requests_per_minute = float(get_config("GEMINI_REQUESTS_PER_MINUTE", "60"))
 input_dir = Path(r"./to_txt")
 output_dir = Path(r"./txt")
 archive_dir = Path(r"./static/cvs")
@@ -58,6 +71,10 @@ def load_excel_data():
         print(f"Erreur lors du chargement des données Excel : {str(e)}")
         return {}
 
+# Verrou pour éviter que deux workers réservent le même nom de fichier
+path_lock = threading.Lock()
+
+
 def unique_path(directory, filename):
     """Renvoie un chemin unique dans le dossier en évitant les écrasements."""
     path = directory / filename
@@ -75,6 +92,22 @@ def unique_path(directory, filename):
         i += 1
 
 
+def reserve_path(directory, filename):
+    """Réserve un chemin unique en créant un fichier vide (sûr entre plusieurs workers)."""
+    with path_lock:
+        path = unique_path(directory, filename)
+        path.touch()
+        return path
+
+
+def archive_file(file):
+    """Déplace le fichier source dans l'archive sans écraser les anciens."""
+    with path_lock:
+        archived_file = unique_path(archive_dir, file.name)
+        shutil.move(str(file), str(archived_file))
+    return archived_file
+
+
 def find_date_for_file(file_name, file_dates):
     """Trouve la date correspondante pour un fichier donné avec une correspondance plus précise."""
     # Supprimer l'extension pour la comparaison
@@ -136,40 +169,83 @@ def format_date(date_str):
         return str(date_str)
 
 
-def parse_files():
-    """Traite les fichiers et ajoute les dates depuis le fichier Excel."""
-    valid_extensions = {'.pdf', '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
+def process_file(file, file_dates, session=None, cache=None):
+    """Extrait un CV, ajoute sa date de réception puis l'archive.
 
-    # Charger les données Excel
-    file_dates = load_excel_data()
+    Retourne le chemin d'extraction utilisé ("cache", "local" ou "gemini"), ou None en cas d'échec.
+    """
+    output_file = None
+    try:
+        output_file = reserve_path(output_dir, f"{file.name}.txt")
+        print(f"Traitement: {file} -> {output_file}")
 
-    for file in input_dir.iterdir():
-        if file.is_file() and file.suffix.lower() in valid_extensions:
-            try:
-                output_file = unique_path(output_dir, f"{file.name}.txt")
-                print(f"Traitement: {file} -> {output_file}")
+        # Extraire le contenu du CV
+        method = extract_cv(input=file, output=output_file, session=session, cache=cache)
 
-                # Extraire le contenu du CV
-                extract_cv(input=file, output=output_file)
+        # Trouver la date correspondante dans le fichier Excel
+        date = find_date_for_file(file.name, file_dates)
+        formatted_date = format_date(date)
 
-                # Trouver la date correspondante dans le fichier Excel
-                date = find_date_for_file(file.name, file_dates)
-                formatted_date = format_date(date)
+        # Déplacement dans archive sans écraser les anciens (le nom peut recevoir un suffixe _1)
+        archived_file = archive_file(file)
 
-                # Ajouter la date au fichier texte
-                add_date_to_file(output_file, formatted_date)
+        # Ajouter la date et le fichier d'origine au fichier texte
+        add_date_to_file(output_file, formatted_date, archived_file.name)
 
-                print(f"✓ Extraction réussie: {output_file} (Date: {formatted_date})")
+        print(f"✓ Extraction réussie ({method}): {output_file} (Date: {formatted_date})")
+        return method
+    except Exception as e:
+        print(f"✗ Erreur lors du traitement de {file}: {str(e)}")
+        # Supprimer le fichier réservé s'il est resté vide
+        if output_file is not None and output_file.exists() and output_file.stat().st_size == 0:
+            output_file.unlink()
+        return None
 
-                # Déplacement dans archive sans écraser les anciens
-                archived_file = unique_path(archive_dir, file.name)
-                shutil.move(str(file), str(archived_file))
-            except Exception as e:
-                print(f"✗ Erreur lors du traitement de {file}: {str(e)}")
 
+def parse_files(workers=None, requests_per_minute=None):
+    """Traite les fichiers en parallèle et ajoute les dates depuis le fichier Excel."""
+    valid_extensions = {'.pdf', '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
+    workers = workers or extraction_workers
+    requests_per_minute = requests_per_minute or gemini_requests_per_minute
+
+    # Charger les données Excel
+    file_dates = load_excel_data()
 
-def add_date_to_file(file_path, date):
-    """Ajoute la date au début du fichier texte avec un format plus détaillé et cohérent."""
+    files = [
+        file for file in input_dir.iterdir()
+        if file.is_file() and file.suffix.lower() in valid_extensions
+    ]
+    if not files:
+        print("Aucun fichier à traiter.")
+        return
+
+    # Seau de jetons et client Gemini partagés par tous les workers
+    rate_limiter = TokenBucket.per_minute(requests_per_minute, burst=workers)
+    session = ExtractionSession(rate_limiter=rate_limiter)
+    cache = ExtractionCache()
+    print(f"Extraction de {len(files)} fichier(s) avec {workers} worker(s), "
+          f"limite de {requests_per_minute:g} requêtes/minute")
+
+    started_at = time.monotonic()
+    methods = Counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_file, file, file_dates, session, cache) for file in files]
+        for future in as_completed(futures):
+            methods[future.result() or "échec"] += 1
+
+    succeeded = len(files) - methods["échec"]
+
+    elapsed = time.monotonic() - started_at
+    files_per_minute = succeeded / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"Bilan: {succeeded}/{len(files)} fichier(s) extrait(s) en {elapsed:.1f}s "
+          f"({files_per_minute:.1f} fichiers/minute)")
+    print(f"Chemins d'extraction: cache={methods['cache']} | texte local={methods['local']} | "
+          f"Gemini={methods['gemini']} | échecs={methods['échec']}")
+    session.report()
+
+
+def add_date_to_file(file_path, date, original_name=None):
+    """Ajoute la date (et le nom du fichier archivé d'origine) au début du fichier texte avec un format cohérent."""
     try:
         # Lire le contenu actuel
         with open(file_path, "r", encoding="utf-8") as file:
@@ -184,7 +260,10 @@ def add_date_to_file(file_path, date):
                 date = format_date(date_from_name)
 
         # Ajouter la date au début avec un format standardisé
-        new_content = f"Date de réception : {date}\n\n{content}"
+        new_content = f"Date de réception : {date}\n"
+        if original_name:
+            new_content += f"Fichier d'origine : {original_name}\n"
+        new_content += f"\n{content}"
 
         # Écrire le nouveau contenu
         with open(file_path, "w", encoding="utf-8") as file:
@@ -193,41 +272,139 @@ def add_date_to_file(file_path, date):
         print(f"Erreur lors de l'ajout de la date au fichier {file_path}: {str(e)}")
 
 
-def get_agent():
+# Prompt et instructions d'extraction, construits une seule fois pour tout le lot
+extraction_model_id = "gemini-1.5-flash"
+extraction_description = "Tu es un expert dans l'analyse des CVs."
+extraction_instructions = [
+    "Utiliser uniquement le français.",
+    "Organiser le CV.",
+    "Produire une copie fidèle du contenu.",
+    "Ne pas modifier le contenu du CV.",
+]
+extraction_message = "Voici le fichier à traiter. Extrait tout le texte du CV sans ajouter de commentaires:"
+# Version du prompt : toute modification du modèle ou des instructions invalide le cache d'extraction
+extraction_prompt_version = hashlib.sha256(json.dumps(
+    [extraction_model_id, extraction_description, extraction_instructions, extraction_message]
+).encode("utf-8")).hexdigest()[:12]
+
+
+def get_agent(client=None):
+    """Construit un agent d'extraction. Un client Gemini existant peut être réutilisé."""
     return Agent(
-        model=Gemini(id="gemini-1.5-flash", api_key=api_key),
-        description="Tu es un expert dans l'analyse des CVs.",
-        instructions=[
-            "Utiliser uniquement le français.",
-            "Organiser le CV.",
-            "Produire une copie fidèle du contenu.",
-            "Ne pas modifier le contenu du CV.",
-        ],
+        model=Gemini(id=extraction_model_id, api_key=api_key, client=client),
+        description=extraction_description,
+        instructions=extraction_instructions,
         markdown=True,
     )
 
 
-def extract_cv(input, output):
-    msg = "Voici le fichier à traiter. Extrait tout le texte du CV sans ajouter de commentaires:"
-    agent = get_agent()
-
+class ExtractionSession:
+    """Session d'extraction réutilisée pour tout un lot de fichiers.
+
+    Le client Gemini (et donc ses connexions HTTP) est créé une seule fois et
+    partagé par tous les workers. Chaque thread garde son propre agent car un
+    agent Agno n'est pas prévu pour des appels concurrents.
+    """
+
+    def __init__(self, rate_limiter=None):
+        from google import genai
+
+        started_at = time.perf_counter()
+        self.client = genai.Client(api_key=api_key)
+        self.rate_limiter = rate_limiter
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.setup_seconds = time.perf_counter() - started_at
+        self.model_seconds = 0.0
+        self.model_calls = 0
+
+    def get_agent(self):
+        """Retourne l'agent du thread courant en le créant au premier appel"""
+        agent = getattr(self.local, "agent", None)
+        if agent is None:
+            started_at = time.perf_counter()
+            agent = get_agent(client=self.client)
+            self.local.agent = agent
+            with self.lock:
+                self.setup_seconds += time.perf_counter() - started_at
+        return agent
+
+    def run(self, input):
+        """Envoie le fichier au modèle et retourne le texte extrait"""
+        agent = self.get_agent()
+
+        # Respecter le quota de l'API du modèle
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+        started_at = time.perf_counter()
+        try:
+            chunks = agent.run(
+                message=extraction_message,
+                files=[File(filepath=str(input))],
+            )
+        finally:
+            with self.lock:
+                self.model_seconds += time.perf_counter() - started_at
+                self.model_calls += 1
+            # Ne pas accumuler l'historique des CV précédents dans la mémoire de l'agent
+            if hasattr(agent, "memory") and hasattr(agent.memory, "clear"):
+                agent.memory.clear()
+
+        return chunks.content.replace("```markdown", "").replace("```", "").strip()
+
+    def report(self):
+        """Affiche le temps de préparation comparé au temps passé dans le modèle"""
+        average = self.model_seconds / self.model_calls if self.model_calls else 0.0
+        print(f"Préparation (client + agents): {self.setup_seconds:.2f}s | "
+              f"Modèle: {self.model_seconds:.1f}s pour {self.model_calls} appel(s) "
+              f"({average:.2f}s/appel)")
+
+
+def extract_cv(input, output, session=None, cache=None):
+    """Extrait le texte d'un CV.
+
+    Retourne "cache" si le fichier a déjà été extrait, "local" si la couche texte
+    du PDF suffit, sinon "gemini".
+    """
     if not input.exists():
         raise FileNotFoundError(f"Le fichier {input} n'existe pas")
 
-    chunks = agent.run(
-        message=msg,
-        files=[File(filepath=str(input))],
-    )
-
-    content = chunks.content.replace("```markdown", "").replace("```", "").strip()
+    # Un fichier déjà extrait (même contenu, même prompt) ne repasse pas par le modèle
+    file_hash = file_sha256(input) if cache is not None else None
+    content = cache.get(file_hash, extraction_prompt_version) if cache is not None else None
+    if content is not None:
+        method = "cache"
+    else:
+        # Les PDF numériques ont déjà une couche texte : inutile d'appeler le modèle
+        content = local_text_or_none(input)
+        method = "local"
+
+    if content is None:
+        # PDF scanné ou image : extraction par le modèle
+        # Sans session fournie, créer une session éphémère (appel unitaire)
+        session = session or ExtractionSession()
+        content = session.run(input)
+        method = "gemini"
+
+    if cache is not None and method != "cache":
+        cache.put(file_hash, extraction_prompt_version, content)
 
     with open(output, "w", encoding="utf-8") as file:
         file.write(content)
+    return method
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extraction du texte des CV avec Gemini")
+    parser.add_argument("--workers", type=int, default=extraction_workers,
+                        help="Nombre de workers d'extraction en parallèle")
+    parser.add_argument("--rpm", type=float, default=gemini_requests_per_minute,
+                        help="Nombre maximum de requêtes Gemini par minute")
+    args = parser.parse_args()
+
     print(f"Début de l'extraction des CV depuis: {input_dir}")
     print(f"Les fichiers texte seront enregistrés dans: {output_dir}")
     print(f"Utilisation du fichier Excel: {excel_file}")
-    parse_files()
-    print("Traitement terminé!")
\ No newline at end of file
+    parse_files(workers=args.workers, requests_per_minute=args.rpm)
+    print("Traitement terminé!")
\ No newline at end of file
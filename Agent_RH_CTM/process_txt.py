@@ -1,16 +1,28 @@
+import argparse
+from pathlib import Path
 
-from agno.embedder.ollama import OllamaEmbedder
 from agno.knowledge.text import TextKnowledgeBase
-from agno.vectordb.lancedb import LanceDb
 from agno.document.chunking.fixed import FixedSizeChunking
 from agno.vectordb.search import SearchType
+from utils.env_config import get_config
+from utils.kb_manifest import KnowledgeManifest
+from utils.kb_loader import ParallelLoader, OllamaBatchEmbedder
+from utils.embedding_cache import CachedBatchEmbedder, CachedOllamaEmbedder, get_embedding_cache
+from utils.lancedb_index import IndexManager
+from utils.candidate_identity import get_candidate_registry, relabel_candidates
+from utils.cv_fields import extract_cv_fields
+from utils.near_duplicates import NearDuplicateIndex, minhash_signature, near_duplicate_threshold, similarity
+from utils.cv_store import CvLanceDb, sql_string, sql_timestamp
 
 
+txt_dir = Path("./txt")
+# Le manifeste est rangé à côté de la table LanceDB qu'il décrit
+manifest_path = Path(get_config("KB_MANIFEST_PATH", "./lancedb/cvs_manifest.json"))
 
-vector_db = LanceDb(
+vector_db = CvLanceDb(
     table_name="cvs",
     uri="lancedb",
-    embedder=OllamaEmbedder(id="nomic-embed-text", dimensions=768),
+    embedder=CachedOllamaEmbedder(id="nomic-embed-text", dimensions=768),
 )
 
 #
@@ -23,9 +35,199 @@ knowledge_base = TextKnowledgeBase(
     chunking_strategy=chunking_strategy
 )
 
+# Embedder du chargeur parallèle : même modèle, mais plusieurs textes par requête,
+# et les chunks déjà vectorisés sont repris du cache
+loader_embedder = CachedBatchEmbedder(OllamaBatchEmbedder(id="nomic-embed-text", dimensions=768))
+
+
+def document_name(key):
+    """Nom du document tel qu'enregistré par le lecteur texte (nom du fichier sans .txt)"""
+    return Path(key).stem
+
+
+def delete_document_vectors(names, group_size=200):
+    """Supprime de la table tous les chunks des documents donnés (colonne 'source')"""
+    names = list(names)
+    for start in range(0, len(names), group_size):
+        values = ", ".join(sql_string(name) for name in names[start:start + group_size])
+        vector_db.table.delete(f"source IN ({values})")
+
+
+def read_signature(directory, key):
+    return minhash_signature((Path(directory) / key).read_text(encoding="utf-8"))
+
+
+def filter_near_duplicates(directory, manifest, keys, updated_keys):
+    """Écarte du chargement les quasi-doublons (MinHash + LSH).
+
+    - Un nouveau fichier presque identique à un document déjà chargé lui est lié
+      (duplicate_of dans le manifeste) et n'est pas vectorisé.
+    - Un fichier modifié dont le contenu a changé de moins que le seuil garde ses vecteurs.
+    Retourne (clés à charger, clés liées, clés peu modifiées).
+    """
+    index = NearDuplicateIndex.from_manifest(manifest.documents)
+    to_load, linked, minor = [], [], []
+    for key in keys:
+        try:
+            signature = read_signature(directory, key)
+        except (OSError, UnicodeDecodeError):
+            signature = None
+        if signature is None:
+            to_load.append((key, None))
+            continue
+        previous = manifest.documents.get(key) or {}
+        if key in updated_keys and not previous.get("duplicate_of") \
+                and similarity(signature, previous.get("minhash")) >= near_duplicate_threshold:
+            # La signature enregistrée reste celle du contenu vectorisé, pour ne pas dériver
+            manifest.record(directory, key, chunks=previous.get("chunks", 0), minhash=previous["minhash"])
+            minor.append(key)
+            continue
+        match = index.find(signature, exclude=key)
+        if match:
+            manifest.record(directory, key, chunks=0, minhash=signature,
+                            duplicate_of=match[0], similarity=round(match[1], 3))
+            index.remove(key)
+            linked.append(key)
+            print(f"🪞 {key} ≈ {match[0]} ({match[1]:.0%}) : lié sans revectorisation")
+            continue
+        # Indexé tout de suite pour repérer les doublons à l'intérieur du même lot
+        index.add(key, signature)
+        to_load.append((key, signature))
+    return to_load, linked, minor
+
+
+def record_resends(directory, manifest, linked):
+    """Reporte sur le document chargé la réception plus récente d'un quasi-doublon lié (CV renvoyé) :
+    date de réception et champs typés de la ligne, et version enregistrée dans la table d'identité"""
+    registry = get_candidate_registry()
+    for key in linked:
+        source = document_name(manifest.documents[key]["duplicate_of"])
+        try:
+            fields = extract_cv_fields((Path(directory) / key).read_text(encoding="utf-8"), source=source)
+        except (OSError, UnicodeDecodeError):
+            continue
+        if fields["reception_date"] is None:
+            continue
+        where = f"source = {sql_string(source)}"
+        current = vector_db.table.search().where(where).select(["reception_date"]).limit(1).to_list()
+        if not current or (current[0]["reception_date"] and current[0]["reception_date"] >= fields["reception_date"]):
+            continue
+        values = {"reception_date": sql_timestamp(fields["reception_date"])}
+        for column in ("candidate_name", "city", "phone", "email", "file_path"):
+            if fields[column]:
+                values[column] = sql_string(fields[column])
+        if fields["experience_years"] is not None:
+            values["experience_years"] = repr(fields["experience_years"])
+        vector_db.table.update(where=where, values_sql=values)
+        candidate_id, merged = registry.resolve(source, fields)
+        relabel_candidates(vector_db.table, merged, candidate_id)
+        print(f"📬 {key} : réception du {fields['reception_date']:%d/%m/%Y} reportée sur {source}")
+
+
+def sync_knowledge_base(directory=txt_dir):
+    """Synchronise la table 'cvs' avec le dossier txt sans tout recharger.
+
+    Seuls les documents nouveaux ou modifiés sont découpés et vectorisés (par le
+    chargeur parallèle) ; les vecteurs des fichiers supprimés sont effacés.
+    Les quasi-doublons d'un document déjà chargé ne sont pas revectorisés.
+    Retourne les compteurs.
+    """
+    manifest = KnowledgeManifest(manifest_path)
+    changes = manifest.scan(directory)
+
+    # Documents déjà chargés sans signature (chargements antérieurs) : la calculer une fois
+    for key in changes["unchanged"]:
+        entry = manifest.documents[key]
+        if "minhash" not in entry:
+            try:
+                entry["minhash"] = read_signature(directory, key)
+            except (OSError, UnicodeDecodeError):
+                entry["minhash"] = None
+
+    # Les quasi-doublons liés à un document retiré sont réexaminés (l'un d'eux sera chargé)
+    removed = set(changes["removed"])
+    relinked = [key for key, entry in manifest.documents.items()
+                if entry.get("duplicate_of") in removed and key not in removed]
+    changes["updated"] += [key for key in relinked if key not in changes["updated"]]
+    changes["unchanged"] = [key for key in changes["unchanged"] if key not in relinked]
+    counts = {"added": 0, "updated": 0, "removed": 0, "skipped": len(changes["unchanged"]),
+              "duplicates": 0, "errors": 0}
+
+    if changes["removed"]:
+        try:
+            delete_document_vectors(document_name(key) for key in changes["removed"])
+            registry = get_candidate_registry()
+            for key in changes["removed"]:
+                manifest.forget(key)
+                registry.forget(document_name(key))
+            counts["removed"] = len(changes["removed"])
+        except Exception as e:
+            print(f"✗ Erreur lors de la suppression des documents retirés: {str(e)}")
+            counts["errors"] += len(changes["removed"])
+
+    changed = changes["updated"] + changes["added"]
+    if changed:
+        try:
+            to_load, linked, minor = filter_near_duplicates(directory, manifest, changed, set(changes["updated"]))
+            counts["duplicates"] = len(linked)
+            counts["updated"] += len(minor)
+            print(f"🪞 Quasi-doublons: {len(linked)} lié(s), {len(minor)} modification(s) mineure(s) "
+                  f"sur {len(changed)} document(s) ({(len(linked) + len(minor)) / len(changed):.0%} non revectorisés)")
+
+            # Aussi pour les ajouts : le document peut venir d'un chargement complet antérieur.
+            # Un document devenu quasi-doublon perd ses anciens vecteurs.
+            delete_document_vectors(document_name(key) for key in [key for key, _ in to_load] + linked)
+            loader = ParallelLoader(vector_db.table, embedder=loader_embedder, registry=get_candidate_registry())
+            chunk_counts = loader.load(Path(directory) / key for key, _ in to_load)
+            for key, signature in to_load:
+                manifest.record(directory, key, chunks=chunk_counts.get(document_name(key), 0), minhash=signature)
+                counts["updated" if key in changes["updated"] else "added"] += 1
+            loader.report()
+            # Après le chargement : le document de référence peut faire partie du même lot
+            record_resends(directory, manifest, linked)
+            cache_stats = get_embedding_cache().stats()
+            print(f"   Cache d'embeddings: {cache_stats['hits']} succès, {cache_stats['misses']} échec(s) "
+                  f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entrée(s)")
+            registry_stats = get_candidate_registry().stats()
+            print(f"   Candidats: {registry_stats['candidates']} pour {registry_stats['documents']} document(s)")
+        except Exception as e:
+            print(f"✗ Erreur lors du chargement des documents: {str(e)}")
+            counts["errors"] += len(changed)
+
+    manifest.save()
+
+    # Tenir à jour l'index plein texte (recherche hybride) et l'index vectoriel après le chargement
+    if counts["added"] or counts["updated"] or counts["removed"] or counts["duplicates"]:
+        IndexManager(vector_db.table).ensure_indexes()
+
+    print(f"Synchronisation terminée: {counts['added']} ajouté(s), {counts['updated']} mis à jour, "
+          f"{counts['removed']} supprimé(s), {counts['skipped']} inchangé(s), "
+          f"{counts['duplicates']} quasi-doublon(s), {counts['errors']} erreur(s)")
+    return counts
+
+
+def rebuild_manifest(directory=txt_dir):
+    """Réinitialise le manifeste à partir du dossier après un chargement complet"""
+    manifest = KnowledgeManifest(manifest_path)
+    manifest.documents = {}
+    for file in sorted(Path(directory).glob("*.txt")):
+        manifest.record(directory, file.relative_to(directory).as_posix())
+    manifest.save()
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chargement des CV dans la base de connaissances")
+    parser.add_argument("--full", action="store_true",
+                        help="Recharger tout le dossier txt au lieu d'une synchronisation incrémentale")
+    args = parser.parse_args()
+
     try:
-        knowledge_base.load()
-        print("Knowledge base loaded successfully.")
+        if args.full:
+            knowledge_base.load()
+            rebuild_manifest()
+            IndexManager(vector_db.table).ensure_indexes()
+            print("Knowledge base loaded successfully.")
+        else:
+            sync_knowledge_base()
     except Exception as e:
         print(f"Error loading knowledge base: {e}")
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from utils.env_config import get_config
+
+# Exécutions simultanées de l'agent et file d'attente au-delà
+agent_max_concurrency = int(get_config("AGENT_MAX_CONCURRENCY", "8"))
+agent_max_queue = int(get_config("AGENT_MAX_QUEUE", "50"))
+agent_queue_timeout = float(get_config("AGENT_QUEUE_TIMEOUT_SECONDS", "120"))
+
+
+class AgentQueueFull(Exception):
+    """Trop de demandes en attente, ou attente trop longue d'une place libre"""
+
+
+class RunSlot:
+    """Place d'exécution obtenue dans la file ; la libération est idempotente et possible depuis un autre thread"""
+
+    def __init__(self, queue, loop):
+        self.queue = queue
+        self.loop = loop
+        self.released = False
+        self.lock = threading.Lock()
+
+    def release(self):
+        with self.lock:
+            if self.released:
+                return
+            self.released = True
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self.loop:
+            self.queue._release()
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.queue._release)
+
+    def bind(self, obj):
+        """Libère aussi la place quand l'objet (par exemple un générateur jamais parcouru) disparaît"""
+        weakref.finalize(obj, self.release)
+        return obj
+
+
+class AgentRunQueue:
+    """Exécute les appels bloquants de l'agent hors de la boucle d'événements.
+
+    Au plus max_concurrency exécutions simultanées dans un pool dédié ; au-delà, les
+    demandes attendent (max_queue au plus, pendant timeout secondes au plus).
+    La profondeur de la file et les temps d'attente sont mesurés.
+    """
+
+    def __init__(self, max_concurrency=None, max_queue=None, timeout=None):
+        self.max_concurrency = max_concurrency or agent_max_concurrency
+        self.max_queue = agent_max_queue if max_queue is None else max_queue
+        self.timeout = agent_queue_timeout if timeout is None else timeout
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="agent-run")
+        self.semaphore = None
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.waits = deque(maxlen=500)
+
+    def _semaphore(self):
+        # Créé dans la boucle d'événements du serveur
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.semaphore
+
+    async def acquire(self):
+        """Attend une place libre. Retourne un RunSlot à libérer à la fin de l'exécution."""
+        semaphore = self._semaphore()
+        if semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AgentQueueFull(f"{self.waiting} demande(s) déjà en attente")
+        self.waiting += 1
+        started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise AgentQueueFull(f"Aucune place libre après {self.timeout:.0f}s d'attente")
+        finally:
+            self.waiting -= 1
+        self.waits.append(time.perf_counter() - started_at)
+        self.running += 1
+        return RunSlot(self, asyncio.get_running_loop())
+
+    def _release(self):
+        self.running -= 1
+        self.completed += 1
+        self.semaphore.release()
+
+    async def run(self, func, *args, **kwargs):
+        """Exécute func(*args, **kwargs) dans le pool dédié une fois une place obtenue"""
+        slot = await self.acquire()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args, **kwargs))
+        finally:
+            slot.release()
+
+    def stats(self):
+        waits = sorted(self.waits)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queue_depth": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "wait_ms_avg": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "wait_ms_p95": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 1) if waits else 0.0,
+            "wait_ms_max": round(waits[-1] * 1000, 1) if waits else 0.0,
+        }
+
+
+agent_queue = AgentRunQueue()
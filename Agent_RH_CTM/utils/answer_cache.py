@@ -0,0 +1,139 @@
+import math
+import operator
+import re
+import threading
+import time
+from datetime import date
+from utils.cv_fields import normalize_text
+from utils.env_config import get_config
+from utils.query_utils import plan_query
+
+# Paramètres du cache de réponses
+answer_cache_threshold = float(get_config("ANSWER_CACHE_THRESHOLD", "0.95"))
+answer_cache_max_entries = int(get_config("ANSWER_CACHE_MAX_ENTRIES", "500"))
+answer_cache_ttl_hours = float(get_config("ANSWER_CACHE_TTL_HOURS", "24"))
+
+# Questions dont la réponse dépend du jour où elles sont posées
+relative_date_pattern = re.compile(
+    r"\b(?:aujourd'?hui|hier|avant.hier|ce jour|cette semaine|semaine derniere|ce mois|mois dernier"
+    r"|cette annee|derniers? jours|recents?|recemment|nouveaux|dernier)\b"
+)
+# Demandes avec effet de bord (emails...) : jamais servies depuis le cache
+action_pattern = re.compile(r"\b(?:envo\w*|e-?mail|mail|convoqu\w*|supprim\w*|ajout\w*|modifi\w*|relanc\w*)\b")
+
+
+def normalize_question(question):
+    return normalize_text(question).replace("’", "'").strip(" ?!.")
+
+
+def is_cacheable(question):
+    return bool(question and question.strip()) and not action_pattern.search(normalize_question(question))
+
+
+def question_scope(question, kb_version):
+    """Portée d'une réponse : version de la base, filtres reconnus et jour pour les questions relatives.
+
+    Deux questions proches mais avec une ville ou une date différente n'ont pas la même portée.
+    """
+    plan = plan_query(question)
+    relative = bool(relative_date_pattern.search(normalize_question(question)))
+    return (
+        kb_version,
+        date.today().isoformat() if relative else None,
+        plan.date_from, plan.date_to, plan.city, plan.min_experience, plan.max_experience,
+        tuple(plan.job_titles),
+    )
+
+
+def unit_vector(vector):
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+class SemanticAnswerCache:
+    """Cache des réponses de l'agent indexé par l'embedding de la question normalisée.
+
+    Une réponse est resservie si une question de même portée a une similarité
+    cosinus au moins égale au seuil. Les entrées expirent après ttl secondes.
+    """
+
+    def __init__(self, threshold=None, max_entries=None, ttl=None):
+        self.threshold = answer_cache_threshold if threshold is None else threshold
+        self.max_entries = max_entries or answer_cache_max_entries
+        self.ttl = ttl if ttl is not None else answer_cache_ttl_hours * 3600
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.stores = 0
+        self.saved_seconds = 0.0
+
+    def lookup(self, scope, embedding):
+        """Retourne l'entrée la plus proche de même portée, ou None"""
+        vector = unit_vector(embedding)
+        now = time.time()
+        with self.lock:
+            best, best_score = None, self.threshold
+            for entry in self.entries.get(scope, []):
+                if now - entry["created_at"] > self.ttl:
+                    continue
+                score = sum(map(operator.mul, vector, entry["vector"]))
+                if score >= best_score:
+                    best, best_score = entry, score
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            best["hits"] += 1
+            self.saved_seconds += best["seconds"]
+            return {**best, "similarity": best_score}
+
+    def store(self, scope, embedding, question, answer, seconds):
+        now = time.time()
+        with self.lock:
+            # Les portées d'anciennes versions de la base ou d'anciens jours ne resserviront plus
+            for key in [key for key in self.entries if key[:2] != scope[:2]]:
+                del self.entries[key]
+            self.entries.setdefault(scope, []).append({
+                "question": question,
+                "answer": answer,
+                "vector": unit_vector(embedding),
+                "created_at": now,
+                "seconds": seconds,
+                "hits": 0,
+            })
+            self.stores += 1
+            total = sum(len(entries) for entries in self.entries.values())
+            while total > self.max_entries:
+                oldest_scope = min(self.entries, key=lambda key: self.entries[key][0]["created_at"])
+                self.entries[oldest_scope].pop(0)
+                if not self.entries[oldest_scope]:
+                    del self.entries[oldest_scope]
+                total -= 1
+
+    def record_bypass(self):
+        with self.lock:
+            self.bypasses += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(len(entries) for entries in self.entries.values()),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bypasses": self.bypasses,
+                "stores": self.stores,
+                "saved_seconds": round(self.saved_seconds, 1),
+            }
+
+
+answer_cache = SemanticAnswerCache()
@@ -0,0 +1,231 @@
+import argparse
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from utils.cv_fields import normalize_text
+from utils.env_config import get_config
+
+# Table d'identité des candidats, rangée à côté de la table LanceDB
+registry_path = Path(get_config("CANDIDATE_REGISTRY_PATH", "./lancedb/candidates.sqlite3"))
+
+
+def identity_keys(fields):
+    """Clés d'identité d'un document : email, téléphone normalisé, et nom (mots triés, sans accents)
+    accompagné de la ville. Un nom seul n'est jamais une clé : des homonymes restent distincts."""
+    keys = []
+    if fields.get("email"):
+        keys.append(("email", fields["email"].lower()))
+    if fields.get("phone"):
+        keys.append(("phone", fields["phone"]))
+    name_words = normalize_text(fields.get("candidate_name") or "").replace("-", " ").split()
+    if len(name_words) >= 2 and fields.get("city"):
+        # "ESSELIMANI Fouad" et "Fouad Esselimani" donnent la même clé
+        keys.append(("name_city", f"{' '.join(sorted(name_words))}|{normalize_text(fields['city'])}"))
+    return keys
+
+
+def make_candidate_id(kind, value):
+    return "cand_" + hashlib.sha1(f"{kind}:{value}".encode("utf-8")).hexdigest()[:12]
+
+
+class CandidateRegistry:
+    """Regroupe les documents (versions de CV, lignes de suivi Excel) par candidat.
+
+    Deux documents appartiennent au même candidat s'ils partagent un email, un
+    téléphone, ou un nom normalisé et une ville sans email ni téléphone
+    contradictoire. Quand un document relie deux candidats connus, ils sont
+    fusionnés dans le plus ancien, dont l'identifiant est conservé.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or registry_path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS candidates (
+                candidate_id TEXT PRIMARY KEY,
+                display_name TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS candidate_keys (
+                kind TEXT NOT NULL,
+                value TEXT NOT NULL,
+                candidate_id TEXT NOT NULL,
+                PRIMARY KEY (kind, value)
+            );
+            CREATE TABLE IF NOT EXISTS candidate_documents (
+                source TEXT PRIMARY KEY,
+                candidate_id TEXT NOT NULL,
+                document_type TEXT,
+                reception_date TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_candidate_keys_candidate ON candidate_keys(candidate_id);
+            CREATE INDEX IF NOT EXISTS idx_candidate_documents_candidate ON candidate_documents(candidate_id);
+            """
+        )
+        self.connection.commit()
+
+    def resolve(self, source, fields):
+        """Associe un document à un candidat. Retourne (candidate_id, identifiants fusionnés dans celui-ci)."""
+        keys = identity_keys(fields)
+        reception_date = fields.get("reception_date")
+        with self.lock:
+            matches = set()
+            for kind, value in keys:
+                row = self.connection.execute(
+                    "SELECT candidate_id FROM candidate_keys WHERE kind = ? AND value = ?", (kind, value)
+                ).fetchone()
+                if row and not (kind == "name_city" and self.contradicts(row[0], keys)):
+                    matches.add(row[0])
+            row = self.connection.execute(
+                "SELECT candidate_id FROM candidate_documents WHERE source = ?", (source,)
+            ).fetchone()
+            if row and not matches:
+                # Document déjà connu dont les clés ont disparu : garder son candidat
+                matches.add(row[0])
+
+            now = time.time()
+            if matches:
+                placeholders = ",".join("?" * len(matches))
+                ordered = self.connection.execute(
+                    f"SELECT candidate_id FROM candidates WHERE candidate_id IN ({placeholders}) "
+                    f"ORDER BY created_at, candidate_id",
+                    list(matches),
+                ).fetchall()
+                candidate_id = ordered[0][0] if ordered else sorted(matches)[0]
+                merged = sorted(matches - {candidate_id})
+                for old_id in merged:
+                    self.connection.execute(
+                        "UPDATE candidate_keys SET candidate_id = ? WHERE candidate_id = ?", (candidate_id, old_id))
+                    self.connection.execute(
+                        "UPDATE candidate_documents SET candidate_id = ? WHERE candidate_id = ?", (candidate_id, old_id))
+                    self.connection.execute("DELETE FROM candidates WHERE candidate_id = ?", (old_id,))
+            else:
+                kind, value = keys[0] if keys else ("source", source)
+                candidate_id = make_candidate_id(kind, value)
+                merged = []
+
+            self.connection.execute(
+                "INSERT INTO candidates (candidate_id, display_name, created_at, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(candidate_id) DO UPDATE SET updated_at = excluded.updated_at, "
+                "display_name = COALESCE(excluded.display_name, candidates.display_name)",
+                (candidate_id, fields.get("candidate_name"), now, now),
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO candidate_keys (kind, value, candidate_id) VALUES (?, ?, ?)",
+                [(kind, value, candidate_id) for kind, value in keys],
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO candidate_documents (source, candidate_id, document_type, reception_date) "
+                "VALUES (?, ?, ?, ?)",
+                (source, candidate_id, fields.get("document_type"),
+                 reception_date.isoformat() if hasattr(reception_date, "isoformat") else reception_date),
+            )
+            self.connection.commit()
+        return candidate_id, merged
+
+    def contradicts(self, candidate_id, keys):
+        """Vrai si le candidat connu a un autre email ou un autre téléphone que le document"""
+        for kind, value in keys:
+            if kind not in ("email", "phone"):
+                continue
+            known = {row[0] for row in self.connection.execute(
+                "SELECT value FROM candidate_keys WHERE candidate_id = ? AND kind = ?", (candidate_id, kind)
+            )}
+            if known and value not in known:
+                return True
+        return False
+
+    def forget(self, source):
+        """Retire un document ; un candidat sans document est supprimé avec ses clés"""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT candidate_id FROM candidate_documents WHERE source = ?", (source,)
+            ).fetchone()
+            if not row:
+                return
+            self.connection.execute("DELETE FROM candidate_documents WHERE source = ?", (source,))
+            remaining = self.connection.execute(
+                "SELECT COUNT(*) FROM candidate_documents WHERE candidate_id = ?", (row[0],)
+            ).fetchone()[0]
+            if not remaining:
+                self.connection.execute("DELETE FROM candidate_keys WHERE candidate_id = ?", (row[0],))
+                self.connection.execute("DELETE FROM candidates WHERE candidate_id = ?", (row[0],))
+            self.connection.commit()
+
+    def documents(self, candidate_id):
+        """Documents d'un candidat, du plus récent au plus ancien"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT source, document_type, reception_date FROM candidate_documents WHERE candidate_id = ? "
+                "ORDER BY reception_date DESC",
+                (candidate_id,),
+            ).fetchall()
+        return [{"source": source, "document_type": document_type, "reception_date": reception_date}
+                for source, document_type, reception_date in rows]
+
+    def clear(self):
+        with self.lock:
+            self.connection.executescript(
+                "DELETE FROM candidates; DELETE FROM candidate_keys; DELETE FROM candidate_documents;"
+            )
+            self.connection.commit()
+
+    def stats(self):
+        with self.lock:
+            candidates = self.connection.execute("SELECT COUNT(*) FROM candidates").fetchone()[0]
+            documents = self.connection.execute("SELECT COUNT(*) FROM candidate_documents").fetchone()[0]
+        return {
+            "path": str(self.path),
+            "candidates": candidates,
+            "documents": documents,
+            "documents_per_candidate": round(documents / candidates, 2) if candidates else 0.0,
+        }
+
+
+def relabel_candidates(table, old_ids, candidate_id):
+    """Reporte une fusion de candidats sur les chunks déjà présents dans la table LanceDB"""
+    if not old_ids:
+        return
+    values = ", ".join(f"'{old_id}'" for old_id in old_ids)
+    table.update(where=f"candidate_id IN ({values})", values={"candidate_id": candidate_id})
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_candidate_registry():
+    """Table d'identité partagée par le chargeur et la base vectorielle"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = CandidateRegistry()
+        return _registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Table d'identité des candidats")
+    parser.add_argument("action", choices=["stats", "show"], nargs="?", default="stats")
+    parser.add_argument("candidate_id", nargs="?", help="Identifiant du candidat (pour 'show')")
+    args = parser.parse_args()
+
+    registry = get_candidate_registry()
+    if args.action == "show" and args.candidate_id:
+        for document in registry.documents(args.candidate_id):
+            print(f"{document['reception_date'] or '-':<20} {document['document_type'] or '-':<6} {document['source']}")
+    else:
+        stats = registry.stats()
+        print(f"👥 {stats['candidates']} candidat(s), {stats['documents']} document(s) "
+              f"({stats['documents_per_candidate']} par candidat) dans {stats['path']}")
+
+
+if __name__ == "__main__":
+    main()
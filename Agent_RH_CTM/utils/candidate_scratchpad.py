@@ -0,0 +1,127 @@
+import re
+from datetime import datetime
+from utils.cv_fields import normalize_text
+from utils.query_utils import plan_query
+
+# Nombre maximum de candidats gardés dans l'état de la session
+scratchpad_max_candidates = 50
+scratchpad_key = "candidates"
+scratchpad_fields = [
+    "candidate_id", "source", "candidate_name", "city", "phone", "email",
+    "experience_years", "reception_date", "document_type",
+]
+
+refinement_pattern = re.compile(
+    r"\b(?:parmi|lesquel(?:le)?s|seulement|uniquement|ceux qui|celles qui|ceux avec|celles avec|dont|filtre\w*)\b"
+    # Formes elliptiques : "et ceux de Rabat ?", "et à Casablanca ?", "et pour plus de 5 ans ?"
+    r"|\b(?:ceux|celles) (?:de|d'|du|des|a|en)"
+    r"|^\W*et (?:a|au|aux|en|pour|sur|avec|de|d'|du|des)\b"
+)
+reference_pattern = re.compile(
+    r"\b(?:lui|leur|eux|elles|le contacter|la contacter|les contacter|ce candidat|cette candidate"
+    r"|ces candidat(?:e)?s|ces profils|son|sa|ses|leurs)\b"
+)
+ordinal_pattern = re.compile(
+    r"\b(?:le|la)\s+(premier|premiere|1er|1ere|deuxieme|second|seconde|2e|troisieme|3e|quatrieme|4e|cinquieme|5e)\b"
+)
+ordinals = {
+    "premier": 0, "premiere": 0, "1er": 0, "1ere": 0, "deuxieme": 1, "second": 1, "seconde": 1, "2e": 1,
+    "troisieme": 2, "3e": 2, "quatrieme": 3, "4e": 3, "cinquieme": 4, "5e": 4,
+}
+
+
+def candidate_items(documents):
+    """Un élément par candidat (ou par fichier) avec ses champs structurés et son meilleur score"""
+    items = {}
+    for document in documents:
+        meta_data = document.get("meta_data") if isinstance(document, dict) else document.meta_data
+        meta_data = meta_data or {}
+        key = meta_data.get("candidate_id") or meta_data.get("source")
+        if not key or key in items:
+            continue
+        item = {field: meta_data.get(field) for field in scratchpad_fields if meta_data.get(field) is not None}
+        if meta_data.get("score") is not None:
+            item["score"] = meta_data["score"]
+        items[key] = item
+    return list(items.values())[:scratchpad_max_candidates]
+
+
+def remember_candidates(agent, question, documents, description=None):
+    """Enregistre le dernier jeu de candidats dans l'état de la session de l'agent"""
+    store_items(agent, question, candidate_items(documents), description)
+
+
+def store_items(agent, question, items, description=None):
+    if not items:
+        return
+    if agent.session_state is None:
+        agent.session_state = {}
+    agent.session_state[scratchpad_key] = {
+        "question": question,
+        "filters": description,
+        "items": items,
+        "updated_at": datetime.now().isoformat(),
+    }
+
+
+def scratchpad_items(agent):
+    state = (agent.session_state or {}).get(scratchpad_key) or {}
+    return state.get("items") or []
+
+
+def filter_items(items, plan):
+    """Applique en mémoire les filtres reconnus dans la question"""
+    selected = []
+    for item in items:
+        received = (item.get("reception_date") or "")[:10]
+        if plan.city and item.get("city") != plan.city:
+            continue
+        if plan.min_experience is not None and (item.get("experience_years") or 0) < plan.min_experience:
+            continue
+        if plan.max_experience is not None and (item.get("experience_years") or 0) > plan.max_experience:
+            continue
+        if plan.date_from and (not received or received < plan.date_from.isoformat()):
+            continue
+        if plan.date_to and (not received or received > plan.date_to.isoformat()):
+            continue
+        selected.append(item)
+    return selected
+
+
+def resolve_follow_up(agent, question):
+    """Répond à une question de suivi à partir des candidats de la session, sans recherche.
+
+    Retourne (description, candidats) ou None si la question n'y fait pas référence.
+    """
+    items = scratchpad_items(agent)
+    if not items:
+        return None
+    text = normalize_text(question).replace("’", "'")
+    plan = plan_query(question)
+
+    # Candidat désigné par son nom
+    named = []
+    for item in items:
+        words = normalize_text(item.get("candidate_name") or "").split()
+        if len(words) >= 2 and all(re.search(rf"\b{re.escape(word)}\b", text) for word in words):
+            named.append(item)
+    if named:
+        return "candidat(s) cité(s) par leur nom", named
+
+    # Candidat désigné par son rang dans la réponse précédente
+    match = ordinal_pattern.search(text)
+    if match and ordinals[match.group(1)] < len(items):
+        return f"{match.group(1)} candidat de la liste précédente", [items[ordinals[match.group(1)]]]
+
+    # Affinage de la liste précédente ("parmi eux, ceux de Rabat")
+    if refinement_pattern.search(text) and plan.has_filters:
+        selected = filter_items(items, plan)
+        if selected:
+            store_items(agent, question, selected, plan.describe())
+            return f"liste précédente filtrée ({plan.describe()})", selected
+
+    # Action sur les candidats de la réponse précédente ("envoie-lui un email"),
+    # sauf si la question décrit elle-même une nouvelle recherche
+    if reference_pattern.search(text) and not plan.has_filters and not plan.job_titles:
+        return "candidats de la réponse précédente", items
+    return None
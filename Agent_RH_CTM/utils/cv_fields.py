@@ -0,0 +1,169 @@
+import re
+import unicodedata
+from datetime import datetime
+
+# Principales villes du Maroc (nom canonique -> variantes rencontrées dans les CV)
+MOROCCAN_CITIES = {
+    "Casablanca": ["casablanca", "casa", "dar el beida", "dar bouazza"],
+    "Rabat": ["rabat"],
+    "Salé": ["sale"],
+    "Témara": ["temara"],
+    "Kénitra": ["kenitra"],
+    "Marrakech": ["marrakech", "marrakesh"],
+    "Agadir": ["agadir"],
+    "Inezgane": ["inezgane"],
+    "Tanger": ["tanger", "tangier"],
+    "Tétouan": ["tetouan"],
+    "Fès": ["fes", "fez"],
+    "Meknès": ["meknes"],
+    "Oujda": ["oujda"],
+    "Nador": ["nador"],
+    "Al Hoceïma": ["al hoceima", "hoceima"],
+    "El Jadida": ["el jadida", "jadida"],
+    "Safi": ["safi"],
+    "Essaouira": ["essaouira"],
+    "Béni Mellal": ["beni mellal"],
+    "Khouribga": ["khouribga"],
+    "Settat": ["settat"],
+    "Berrechid": ["berrechid"],
+    "Mohammedia": ["mohammedia"],
+    "Khémisset": ["khemisset"],
+    "Taza": ["taza"],
+    "Errachidia": ["errachidia"],
+    "Ouarzazate": ["ouarzazate"],
+    "Taroudant": ["taroudant"],
+    "Tiznit": ["tiznit"],
+    "Guelmim": ["guelmim"],
+    "Laâyoune": ["laayoune", "layoune"],
+    "Dakhla": ["dakhla"],
+    "Larache": ["larache"],
+    "Ksar El Kébir": ["ksar el kebir"],
+    "Berkane": ["berkane"],
+    "Ifrane": ["ifrane"],
+}
+
+email_pattern = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+phone_pattern = re.compile(r"(?:(?:\+|00)212[\s.-]?|0)[5-7](?:[\s.-]?\d){8}")
+reception_pattern = re.compile(
+    r"Date de réception\s*:\s*(\d{1,2})/(\d{1,2})/(\d{2,4})(?:\s*(?:à)?\s*(\d{1,2}):(\d{2})(?::(\d{2}))?)?"
+)
+# Lignes de suivi issues du fichier Excel (excel_to_txt)
+excel_date_pattern = re.compile(r"^Date\s*:\s*(\d{1,2})/(\d{1,2})/(\d{2,4})", re.MULTILINE)
+excel_name_pattern = re.compile(r"^Nom et Prénom\s*:\s*(.+)$", re.MULTILINE)
+# Fichier d'origine archivé dans static/cvs, indiqué en tête du fichier texte par process_to_txt
+origin_pattern = re.compile(r"^Fichier d'origine\s*:\s*(.+)$", re.MULTILINE)
+name_line_pattern = re.compile(r"^(?:Nom(?: et Prénom| complet)?|Name)\s*:\s*(.+)$", re.MULTILINE | re.IGNORECASE)
+# Mots des titres de rubrique en tête de CV, qui ne sont jamais un nom de candidat
+header_words = {
+    "curriculum", "vitae", "cv", "resume", "informations", "information", "personnelles", "personnelle",
+    "personal", "details", "profil", "profile", "contact", "coordonnees", "etat", "civil", "objectif",
+    "experience", "experiences", "professionnelle", "professionnelles", "formation", "formations",
+    "competences", "langues", "loisirs", "diplomes", "parcours", "candidature", "lettre", "motivation",
+}
+experience_patterns = [
+    re.compile(r"(\d{1,2})\s*(?:\+\s*)?(?:ans|années|annees|years)\s+d['’ ]?\s*(?:expérience|experience)", re.IGNORECASE),
+    re.compile(r"(?:expérience|experience)\s*(?:professionnelle)?\s*(?:de|:)?\s*(?:plus de\s*)?(\d{1,2})\s*(?:ans|années|annees|years)", re.IGNORECASE),
+]
+
+
+def normalize_text(text):
+    """Minuscules sans accents, pour comparer des noms et des villes"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def normalize_phone(phone):
+    """Ramène un numéro marocain au format 0XXXXXXXXX"""
+    digits = re.sub(r"\D", "", phone or "")
+    if digits.startswith("00212"):
+        digits = "0" + digits[5:]
+    elif digits.startswith("212"):
+        digits = "0" + digits[3:]
+    return digits if len(digits) == 10 else None
+
+
+def find_city(text):
+    """Retourne le nom canonique de la première ville marocaine citée dans le texte"""
+    normalized = normalize_text(text)
+    best = None
+    for city, variants in MOROCCAN_CITIES.items():
+        for variant in variants:
+            match = re.search(rf"\b{re.escape(variant)}\b", normalized)
+            if match and (best is None or match.start() < best[0]):
+                best = (match.start(), city)
+    return best[1] if best else None
+
+
+def parse_date(day, month, year, hour=None, minute=None, second=None):
+    year = int(year)
+    if year < 100:
+        year += 2000
+    try:
+        return datetime(year, int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0))
+    except ValueError:
+        return None
+
+
+def find_reception_date(text):
+    """Date de réception ajoutée en tête de fichier par process_to_txt, ou date de la ligne Excel"""
+    match = reception_pattern.search(text) or excel_date_pattern.search(text)
+    return parse_date(*match.groups()) if match else None
+
+
+def find_candidate_name(text):
+    match = excel_name_pattern.search(text) or name_line_pattern.search(text)
+    if match:
+        return match.group(1).strip(" *#") or None
+    # À défaut, première ligne courte en lettres seulement (souvent le nom en tête de CV)
+    for line in text.splitlines()[:12]:
+        line = line.strip(" *#\t")
+        if not line or line.startswith("Date de réception"):
+            continue
+        words = line.split()
+        if 2 <= len(words) <= 4 and all(re.fullmatch(r"[^\W\d_]+(?:[-'][^\W\d_]+)*", word) for word in words):
+            # "CURRICULUM VITAE", "Informations personnelles"... sont des titres, pas des noms
+            if any(word in header_words for word in normalize_text(line).split()):
+                continue
+            return line
+    return None
+
+
+def find_original_file(text, source=None):
+    """Nom du fichier d'origine dans static/cvs. Pour les extractions antérieures à l'en-tête, il est
+    déduit du nom du fichier texte ("cv.pdf_1" -> "cv_1.pdf"). Une ligne de suivi Excel n'en a pas."""
+    match = origin_pattern.search(text)
+    if match:
+        return match.group(1).strip()
+    if not source or excel_name_pattern.search(text):
+        return None
+    match = re.fullmatch(r"(.+?)(\.[A-Za-z0-9]+)(?:_(\d+))?", source)
+    if not match:
+        return None
+    base, suffix, index = match.groups()
+    return f"{base}_{index}{suffix}" if index else f"{base}{suffix}"
+
+
+def find_experience_years(text):
+    """Nombre d'années d'expérience le plus élevé mentionné dans le texte"""
+    years = [int(value) for pattern in experience_patterns for value in pattern.findall(text)]
+    years = [value for value in years if 0 < value < 50]
+    return float(max(years)) if years else None
+
+
+def extract_cv_fields(text, source=None):
+    """Extrait les champs structurés d'un CV ou d'une ligne de suivi"""
+    email = email_pattern.search(text)
+    phone = phone_pattern.search(text)
+    return {
+        "source": source,
+        "reception_date": find_reception_date(text),
+        "candidate_name": find_candidate_name(text),
+        "city": find_city(text),
+        "phone": normalize_phone(phone.group(0)) if phone else None,
+        "email": email.group(0).lower() if email else None,
+        "experience_years": find_experience_years(text),
+        # Les lignes de suivi Excel commencent par "Nom et Prénom:" ; le reste est un CV
+        "document_type": "suivi" if excel_name_pattern.search(text) else "cv",
+        "file_path": find_original_file(text, source),
+    }
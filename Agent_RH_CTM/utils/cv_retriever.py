@@ -0,0 +1,129 @@
+import time
+from typing import Any, Dict, List, Optional
+
+from utils.candidate_scratchpad import remember_candidates, resolve_follow_up
+from utils.env_config import get_config
+from utils.run_chunks import run_chunks
+from utils.search_prefetch import search_prefetcher
+from utils.query_utils import plan_query
+
+# Nombre maximum de passages remis au modèle pour une question filtrée
+planner_max_candidates = int(get_config("PLANNER_MAX_CANDIDATES", "20"))
+
+
+def planned_search(vector_db, question: str, limit: Optional[int] = None):
+    """Applique le planificateur à une question et lance une seule recherche filtrée.
+
+    Retourne (plan, documents) ; documents vaut None si la question ne contient aucun filtre.
+    """
+    plan = plan_query(question)
+    if not plan.has_filters:
+        return plan, None
+    started_at = time.perf_counter()
+    documents = vector_db.filtered_search(plan.search_text, where=plan.where, limit=limit or planner_max_candidates)
+    print(f"🧭 Recherche planifiée ({plan.describe()}): {len(documents)} résultat(s) "
+          f"en {(time.perf_counter() - started_at) * 1000:.0f} ms")
+    return plan, documents
+
+
+def planned_summary(vector_db, plan, documents):
+    """En-tête des résultats planifiés : nombre total de candidats filtrés et troncature éventuelle"""
+    shown = len({
+        (document.meta_data or {}).get("candidate_id") or (document.meta_data or {}).get("source")
+        for document in documents
+    })
+    total = max(vector_db.count_candidates(plan.where), shown)
+    summary = {"filtres_appliques": plan.describe(), "nombre_de_resultats": total, "candidats_fournis": shown}
+    if total > shown:
+        summary["liste_tronquee"] = True
+    return summary
+
+
+def set_user_message(agent, message):
+    """À appeler juste avant agent.run / agent.arun avec le message de l'utilisateur.
+
+    agno ne renseigne agent.run_input qu'après la réponse du modèle : le retriever
+    s'appuie sur ce message pour reconnaître l'ajout des références, premier appel
+    du run avec le message lui-même, et le distinguer des appels de l'outil.
+    """
+    agent.cv_user_message = message
+    agent.cv_references_pending = True
+    agent.cv_prepared_references = None
+
+
+def user_message(agent):
+    """Message de l'utilisateur du run en cours (None si set_user_message n'a pas été appelé)"""
+    return getattr(agent, "cv_user_message", None)
+
+
+def cv_retriever(agent, query: str, num_documents: Optional[int] = None, **kwargs) -> Optional[List[Dict[str, Any]]]:
+    """Retriever de l'agent pour la table des CV.
+
+    - Question de l'utilisateur (références ajoutées avant le premier appel au modèle) :
+      une question de suivi sur les candidats précédents est servie depuis l'état de la
+      session ; si des filtres sont reconnus, le jeu de candidats filtré est remis
+      directement ; sinon rien n'est ajouté et l'agent recherche lui-même.
+    - Appel de l'outil de recherche : requête planifiée si elle contient des filtres,
+      résultat préchargé si la requête correspond à la question, recherche hybride sinon.
+
+    Les candidats retrouvés sont gardés dans l'état de la session pour les questions suivantes.
+    Dans un même run, un chunk déjà fourni au modèle est remplacé par un renvoi à sa référence.
+
+    Le retriever est synchrone (agno ne l'attend pas). Pour un run asynchrone, les
+    références de la question sont calculées d'avance dans un thread par prepare_references.
+    """
+    # Seul le premier appel avec le message lui-même est l'ajout des références ;
+    # un appel de l'outil avec le même texte est une recherche ordinaire
+    is_user_question = getattr(agent, "cv_references_pending", False) and query == user_message(agent)
+    if is_user_question:
+        agent.cv_references_pending = False
+        prepared = getattr(agent, "cv_prepared_references", None)
+        if prepared is not None:
+            agent.cv_prepared_references = None
+            return finish_references(agent, prepared[0])
+    return finish_references(agent, retrieve_cvs(agent, query, num_documents, is_user_question))
+
+
+def prepare_references(agent):
+    """Calcule les références de la question enregistrée par set_user_message, avant agent.arun.
+
+    À exécuter hors de la boucle d'événements (asyncio.to_thread) : la recherche est
+    bloquante et le retriever, appelé par arun sur la boucle, servira ce résultat.
+    """
+    agent.initialize_agent()
+    # État de la session (candidats précédents) pour les questions de suivi
+    agent.read_from_storage()
+    agent.cv_prepared_references = (retrieve_cvs(agent, user_message(agent), None, True),)
+
+
+def finish_references(agent, result):
+    """Assemble l'en-tête et les passages, les passages déjà fournis dans le run devenant des renvois"""
+    if result is None:
+        return None
+    header, documents = result
+    return (header + run_chunks.filter(agent.run_id, documents)) or None
+
+
+def retrieve_cvs(agent, query: str, num_documents: Optional[int], is_user_question: bool):
+    """Retourne (en-tête, passages) ou None"""
+    vector_db = agent.knowledge.vector_db
+    if is_user_question:
+        follow_up = resolve_follow_up(agent, query)
+        if follow_up is not None:
+            description, items = follow_up
+            print(f"🗒️ Question de suivi servie depuis la session ({description}): {len(items)} candidat(s)")
+            return [{"candidats_de_la_session": description, "nombre_de_resultats": len(items)}] + items, []
+
+    plan, documents = planned_search(vector_db, query)
+    if documents is not None:
+        remember_candidates(agent, query, documents, plan.describe())
+        return [planned_summary(vector_db, plan, documents)], documents
+
+    if is_user_question:
+        return None
+    limit = num_documents or agent.knowledge.num_documents
+    documents = search_prefetcher.take(user_message(agent), query, limit)
+    if documents is None:
+        documents = vector_db.search(query, limit=limit)
+    remember_candidates(agent, query, documents)
+    return [], documents
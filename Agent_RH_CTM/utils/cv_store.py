@@ -0,0 +1,348 @@
+import json
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from agno.document import Document
+from agno.vectordb.lancedb import LanceDb
+from agno.vectordb.search import SearchType
+from utils.candidate_identity import get_candidate_registry, relabel_candidates
+from utils.cv_fields import extract_cv_fields
+from utils.kb_loader import build_rows, cvs_schema, metadata_columns
+from utils.lancedb_index import IndexManager
+from utils.retrieval_cache import get_retrieval_cache, normalize_query
+
+
+def sql_string(value):
+    """Littéral SQL échappé"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def sql_timestamp(value):
+    return f"timestamp '{value.strftime('%Y-%m-%d %H:%M:%S')}'"
+
+
+def build_where(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    city: Optional[str] = None,
+    min_experience: Optional[float] = None,
+    max_experience: Optional[float] = None,
+    candidate_name: Optional[str] = None,
+    email: Optional[str] = None,
+    phone: Optional[str] = None,
+    source: Optional[str] = None,
+) -> Optional[str]:
+    """Construit le filtre SQL appliqué avant la recherche sur les colonnes typées.
+
+    Une date sans heure en borne haute inclut toute la journée.
+    """
+    conditions = []
+    if date_from is not None:
+        if not isinstance(date_from, datetime):
+            date_from = datetime(date_from.year, date_from.month, date_from.day)
+        conditions.append(f"reception_date >= {sql_timestamp(date_from)}")
+    if date_to is not None:
+        if isinstance(date_to, datetime):
+            conditions.append(f"reception_date <= {sql_timestamp(date_to)}")
+        else:
+            next_day = datetime(date_to.year, date_to.month, date_to.day) + timedelta(days=1)
+            conditions.append(f"reception_date < {sql_timestamp(next_day)}")
+    if city:
+        conditions.append(f"city = {sql_string(city)}")
+    if min_experience is not None:
+        conditions.append(f"experience_years >= {float(min_experience)}")
+    if max_experience is not None:
+        conditions.append(f"experience_years <= {float(max_experience)}")
+    if candidate_name:
+        conditions.append(f"lower(candidate_name) LIKE {sql_string('%' + candidate_name.lower() + '%')}")
+    if email:
+        conditions.append(f"email = {sql_string(email.lower())}")
+    if phone:
+        conditions.append(f"phone = {sql_string(phone)}")
+    if source:
+        conditions.append(f"source = {sql_string(source)}")
+    return " AND ".join(conditions) if conditions else None
+
+
+# Filtres acceptés par build_where (les autres clés transmises par agno sont ignorées)
+where_filters = (
+    "date_from", "date_to", "city", "min_experience", "max_experience", "candidate_name", "email", "phone", "source",
+)
+
+
+def candidate_key(document: Document):
+    meta_data = document.meta_data or {}
+    return meta_data.get("candidate_id"), meta_data.get("document_type")
+
+
+def latest_sources(documents: List[Document]) -> Dict[Any, str]:
+    """Document le plus récent de chaque candidat des résultats, d'après la table d'identité
+    (toutes ses versions connues, pas seulement celles retournées par la recherche)"""
+    registry = get_candidate_registry()
+    latest = {}
+    for key in dict.fromkeys(candidate_key(document) for document in documents):
+        if not key[0]:
+            continue
+        versions = [version for version in registry.documents(key[0]) if version["document_type"] == key[1]]
+        if versions:
+            latest[key] = versions[0]["source"]
+    return latest
+
+
+def collapse_candidates(documents: List[Document], latest: Optional[Dict[Any, str]] = None) -> List[Document]:
+    """Une seule version par candidat : ne garde que les passages de son document le plus récent.
+
+    latest donne le document le plus récent de chaque candidat (table d'identité) ; s'il est
+    absent des résultats, la version la plus récente parmi eux est gardée.
+    CV et lignes de suivi sont regroupés séparément. L'ordre des résultats est conservé.
+    """
+    latest = latest or {}
+    returned = {document.meta_data.get("source") for document in documents if document.meta_data}
+    kept = {}
+    for document in documents:
+        meta_data = document.meta_data or {}
+        key = candidate_key(document)
+        if not key[0]:
+            continue
+        if latest.get(key) in returned:
+            kept[key] = ("", latest[key])
+            continue
+        received = meta_data.get("reception_date") or ""
+        if key not in kept or received > kept[key][0]:
+            kept[key] = (received, meta_data.get("source"))
+    collapsed = []
+    for document in documents:
+        key = candidate_key(document)
+        if key[0] and kept[key][1] != (document.meta_data or {}).get("source"):
+            continue
+        collapsed.append(document)
+    return collapsed
+
+
+def has_typed_columns(table) -> bool:
+    """Indique si la table possède déjà les colonnes de métadonnées"""
+    return set(metadata_columns).issubset(set(table.schema.names))
+
+
+class CvLanceDb(LanceDb):
+    """Table LanceDB des CV avec colonnes typées (date de réception, nom, ville, téléphone,
+    email, expérience, candidat) à côté de chaque vecteur, et recherche pré-filtrée en SQL.
+    Les résultats sont regroupés par candidat (dernière version seulement)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Ancienne table (vector, id, payload) : migrée dès l'ouverture, pour l'API comme pour le chargeur
+        if not has_typed_columns(self.table):
+            self.recreate_with_typed_columns()
+
+    def _base_schema(self):
+        return cvs_schema(self.dimensions)
+
+    def _init_table(self):
+        """Nouvelle table créée directement avec les colonnes typées"""
+        return self.connection.create_table(
+            self.table_name, schema=self._base_schema(), mode="overwrite", exist_ok=True
+        )
+
+    def create(self) -> None:
+        if not self.exists():
+            self.table = self._init_table()
+
+    def insert(self, documents: List[Document], filters: Optional[Dict[str, Any]] = None) -> None:
+        """Insère des documents (ajouts de l'agent) en renseignant les colonnes typées"""
+        import pyarrow as pa
+
+        if not documents:
+            return
+        # Champs et candidat résolus une fois par document, sur le texte de tous ses chunks
+        registry = get_candidate_registry()
+        document_fields, merges = {}, []
+        for name in dict.fromkeys(document.name for document in documents):
+            text = "\n".join(document.content for document in documents if document.name == name)
+            fields = extract_cv_fields(text, source=name)
+            fields["candidate_id"], merged = registry.resolve(name, fields)
+            document_fields[name] = fields
+            if merged:
+                merges.append((merged, fields["candidate_id"]))
+
+        chunks, vectors = [], []
+        for document in documents:
+            document.embed(embedder=self.embedder)
+            chunks.append({
+                "name": document.name,
+                "content": document.content,
+                "meta_data": document.meta_data,
+                "fields": document_fields[document.name],
+            })
+            vectors.append(document.embedding)
+        rows = build_rows(chunks, vectors)
+        self.table.add(pa.Table.from_pydict(rows, schema=cvs_schema(self.dimensions)))
+        for merged, candidate_id in merges:
+            relabel_candidates(self.table, merged, candidate_id)
+
+    def upsert(self, documents: List[Document], filters: Optional[Dict[str, Any]] = None) -> None:
+        self.insert(documents, filters)
+
+    def recreate_with_typed_columns(self) -> None:
+        """Migre la table vers le schéma avec colonnes typées en conservant toutes ses lignes
+        (documents chargés et ajouts de l'agent) : vecteurs et contenus sont repris tels quels,
+        les colonnes absentes de l'ancien schéma sont extraites du texte de chaque document."""
+        import pyarrow as pa
+
+        print(f"🔧 Migration de la table '{self.table_name}' vers le schéma avec colonnes typées")
+        old = self.table.to_arrow()
+        payloads = [json.loads(payload) for payload in old["payload"].to_pylist()]
+        old_columns = {column: old[column].to_pylist() for column in metadata_columns if column in old.schema.names}
+        texts, first_rows = {}, {}
+        for index, payload in enumerate(payloads):
+            texts.setdefault(payload["name"], []).append(payload["content"])
+            first_rows.setdefault(payload["name"], index)
+
+        registry = get_candidate_registry()
+        document_fields, merges = {}, []
+        for name, contents in texts.items():
+            fields = extract_cv_fields("\n".join(contents), source=name)
+            # Valeurs déjà présentes dans la table (dates reportées, candidats) conservées
+            for column, values in old_columns.items():
+                if values[first_rows[name]] is not None:
+                    fields[column] = values[first_rows[name]]
+            if not fields.get("candidate_id"):
+                fields["candidate_id"], merged = registry.resolve(fields.get("source") or name, fields)
+                if merged:
+                    merges.append((merged, fields["candidate_id"]))
+            document_fields[name] = fields
+
+        chunks = [
+            {"name": payload["name"], "content": payload["content"], "meta_data": payload.get("meta_data"),
+             "fields": document_fields[payload["name"]]}
+            for payload in payloads
+        ]
+        rows = build_rows(chunks, old["vector"].to_pylist())
+        self.connection.drop_table(self.table_name)
+        self.table = self.connection.create_table(self.table_name, schema=self._base_schema())
+        if chunks:
+            self.table.add(pa.Table.from_pydict(rows, schema=self._base_schema()))
+        for merged, candidate_id in merges:
+            relabel_candidates(self.table, merged, candidate_id)
+        print(f"✅ {len(chunks)} ligne(s) migrée(s) ({len(texts)} document(s))")
+        self.fts_index_exists = False
+        # L'état des index décrivait l'ancienne table
+        IndexManager(self.table).save_state({})
+
+    def search(self, query: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Document]:
+        filters = {key: value for key, value in (filters or {}).items() if key in where_filters}
+        return self.filtered_search(query, where=build_where(**filters) if filters else None, limit=limit)
+
+    def filtered_search(
+        self, query: Optional[str], where: Optional[str] = None, limit: int = 5, collapse: bool = True
+    ) -> List[Document]:
+        """Recherche (hybride ou vectorielle) restreinte par un filtre SQL appliqué avant la recherche.
+
+        Sans texte de requête, retourne simplement les lignes qui satisfont le filtre.
+        Les colonnes typées et le score sont ajoutés aux métadonnées des documents.
+        Avec collapse, les anciennes versions d'un même candidat sont écartées.
+        Les résultats sont mis en cache jusqu'au prochain changement de version de la table.
+        """
+        def compute():
+            if not collapse:
+                return self._raw_search(query, where, limit)
+            # Marge pour compenser les passages écartés par le regroupement
+            documents = self._raw_search(query, where, limit * 3)
+            latest = latest_sources(documents)
+            return collapse_candidates(self._with_latest_versions(query, where, documents, latest), latest)[:limit]
+
+        key = (self.uri, self.table_name, normalize_query(query), where, limit, collapse)
+        return get_retrieval_cache().search_results(self.table.version, key, compute)
+
+    def _with_latest_versions(self, query, where, documents, latest):
+        """Ajoute, à la place du premier résultat de chaque candidat, les passages de sa version la
+        plus récente quand la recherche ne l'a pas retournée (et qu'elle satisfait le filtre)"""
+        returned = {document.meta_data.get("source") for document in documents if document.meta_data}
+        merged, seen = [], set()
+        for document in documents:
+            key = candidate_key(document)
+            if key[0] and key not in seen and latest.get(key) not in (None, *returned):
+                condition = f"source = {sql_string(latest[key])}" + (f" AND ({where})" if where else "")
+                merged.extend(self._raw_search(query, condition, 3))
+            seen.add(key)
+            merged.append(document)
+        return merged
+
+    def count_candidates(self, where: Optional[str] = None) -> int:
+        """Nombre de candidats distincts (ou de fichiers sans candidat) qui satisfont le filtre"""
+        def compute():
+            rows = self.table.count_rows(where)
+            if not rows:
+                return [0]
+            builder = self.table.search()
+            if where:
+                builder = builder.where(where)
+            found = builder.select(["candidate_id", "source"]).limit(rows).to_arrow()
+            return [len(set(
+                candidate_id or source
+                for candidate_id, source in zip(found["candidate_id"].to_pylist(), found["source"].to_pylist())
+            ))]
+
+        key = (self.uri, self.table_name, "count_candidates", where)
+        return get_retrieval_cache().search_results(self.table.version, key, compute)[0]
+
+    def _raw_search(self, query: Optional[str], where: Optional[str], limit: int) -> List[Document]:
+        if not query or not query.strip():
+            # Sans texte de requête : parcours complet des lignes filtrées (sans les vecteurs),
+            # les plus récentes d'abord, pour un résultat complet et stable
+            rows = self.table.count_rows(where)
+            if not rows:
+                return []
+            builder = self.table.search()
+            if where:
+                builder = builder.where(where)
+            results = builder.select(["id", "payload", *metadata_columns]).limit(rows).to_pandas()
+            results = results.sort_values("reception_date", ascending=False, na_position="last")
+            return self._to_documents(results.head(limit))
+
+        query_embedding = get_retrieval_cache().query_embedding(self.embedder, query)
+        if self.search_type == SearchType.vector:
+            builder = self.table.search(query_embedding, vector_column_name=self._vector_col)
+        else:
+            if not self.fts_index_exists:
+                self.table.create_fts_index("payload", replace=True)
+                self.fts_index_exists = True
+            builder = (
+                self.table.search(query_type="hybrid", vector_column_name=self._vector_col)
+                .vector(query_embedding)
+                .text(query)
+            )
+        if where:
+            builder = builder.where(where, prefilter=True)
+        if self.nprobes:
+            builder = builder.nprobes(self.nprobes)
+        return self._to_documents(builder.limit(limit).to_pandas())
+
+    def _to_documents(self, results) -> List[Document]:
+        documents = []
+        for _, item in results.iterrows():
+            payload = json.loads(item["payload"])
+            meta_data = dict(payload.get("meta_data") or {})
+            for column in metadata_columns:
+                value = item.get(column)
+                if value is None or value != value:  # None ou NaN/NaT
+                    continue
+                if hasattr(value, "isoformat"):
+                    value = value.isoformat()
+                elif hasattr(value, "item"):
+                    value = value.item()
+                meta_data[column] = value
+            for score_column in ("_relevance_score", "_distance", "_score"):
+                if score_column in item and item[score_column] == item[score_column]:
+                    meta_data["score"] = float(item[score_column])
+                    meta_data["score_type"] = score_column.strip("_")
+                    break
+            documents.append(Document(
+                id=item.get("id"),
+                name=payload["name"],
+                meta_data=meta_data,
+                content=payload["content"],
+                embedder=self.embedder,
+                usage=payload.get("usage"),
+            ))
+        return documents
@@ -0,0 +1,253 @@
+import argparse
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from agno.embedder.ollama import OllamaEmbedder
+from utils.env_config import get_config
+
+# Emplacement et taille maximale du cache d'embeddings
+cache_path = Path(get_config("EMBEDDING_CACHE_PATH", "./.cache/embeddings.sqlite3"))
+cache_max_entries = int(get_config("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_model(model, endpoint=None):
+    """Modèle tel qu'enregistré dans le cache : /api/embed (vecteurs normalisés) et /api/embeddings
+    ne donnent pas les mêmes vecteurs pour un même texte"""
+    return f"{model}@{endpoint}" if endpoint else model
+
+
+class EmbeddingCache:
+    """Cache SQLite des embeddings, indexé par (modèle, dimensions, empreinte du texte).
+
+    Les vecteurs sont stockés en float32. Au-delà de max_entries, les entrées les
+    moins récemment utilisées sont supprimées. Les succès et échecs sont comptés
+    pour le processus et cumulés dans la base (commande stats).
+    """
+
+    def __init__(self, path=None, max_entries=None):
+        self.path = Path(path or cache_path)
+        self.max_entries = max_entries if max_entries is not None else cache_max_entries
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dimensions, text_hash)
+            )
+            """
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        self.connection.commit()
+        self.hits = 0
+        self.misses = 0
+        self.writes_since_eviction = 0
+
+    def get_many(self, model, dimensions, texts):
+        """Retourne une liste de vecteurs (None pour les textes absents du cache)"""
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        with self.lock:
+            for start in range(0, len(hashes), 500):
+                group = hashes[start:start + 500]
+                placeholders = ",".join("?" * len(group))
+                rows = self.connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND dimensions = ? "
+                    f"AND text_hash IN ({placeholders})",
+                    [model, dimensions, *group],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                    [(now, model, dimensions, key) for key in found],
+                )
+            hits = sum(1 for key in hashes if key in found)
+            self.hits += hits
+            self.misses += len(hashes) - hits
+            self.connection.executemany(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                [("hits", hits), ("misses", len(hashes) - hits)],
+            )
+            self.connection.commit()
+        return [array("f", found[key]).tolist() if key in found else None for key in hashes]
+
+    def get(self, model, dimensions, text):
+        return self.get_many(model, dimensions, [text])[0]
+
+    def put_many(self, model, dimensions, texts, vectors):
+        """Enregistre des vecteurs puis applique la limite de taille si nécessaire"""
+        now = time.time()
+        rows = [
+            (model, dimensions, text_hash(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dimensions, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.connection.commit()
+            self.writes_since_eviction += len(rows)
+            # Vérifier la taille seulement de temps en temps
+            if self.writes_since_eviction >= 1000:
+                self._evict()
+
+    def put(self, model, dimensions, text, vector):
+        self.put_many(model, dimensions, [text], [vector])
+
+    def _evict(self):
+        count = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if count > self.max_entries:
+            self.connection.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            self.connection.commit()
+        self.writes_since_eviction = 0
+
+    def evict(self):
+        """Applique immédiatement la limite de taille"""
+        with self.lock:
+            self._evict()
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM embeddings")
+            self.connection.execute("DELETE FROM counters")
+            self.connection.commit()
+            self.connection.execute("VACUUM")
+
+    def stats(self):
+        """Retourne le nombre d'entrées, le taux de succès depuis le démarrage et les compteurs cumulés"""
+        with self.lock:
+            count = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            totals = dict(self.connection.execute("SELECT name, value FROM counters").fetchall())
+            lookups = self.hits + self.misses
+            total_lookups = totals.get("hits", 0) + totals.get("misses", 0)
+            return {
+                "path": str(self.path),
+                "entries": count,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "total_hits": totals.get("hits", 0),
+                "total_misses": totals.get("misses", 0),
+                "total_hit_rate": totals.get("hits", 0) / total_lookups if total_lookups else 0.0,
+            }
+
+
+# Cache partagé par le chargeur et les recherches d'un même processus
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Retourne l'instance partagée du cache d'embeddings"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
+
+
+class CachedBatchEmbedder:
+    """Enveloppe un embedder par lots (chargeur parallèle) avec le cache d'embeddings"""
+
+    def __init__(self, embedder, cache=None):
+        self.embedder = embedder
+        self.cache = cache or get_embedding_cache()
+        self.id = embedder.id
+        self.dimensions = embedder.dimensions
+        self.model = cache_model(embedder.id, getattr(embedder, "endpoint", None))
+
+    def embed_batch(self, texts):
+        texts = list(texts)
+        vectors = self.cache.get_many(self.model, self.dimensions, texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.embedder.embed_batch([texts[i] for i in missing])
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+            self.cache.put_many(self.model, self.dimensions, [texts[i] for i in missing], computed)
+        return vectors
+
+
+@dataclass
+class CachedOllamaEmbedder(OllamaEmbedder):
+    """OllamaEmbedder qui consulte le cache d'embeddings avant d'appeler Ollama (recherches).
+
+    Les questions sont vectorisées par /api/embed, comme les documents au chargement
+    (OllamaBatchEmbedder), pour que requêtes et documents soient comparables.
+    """
+
+    cache: Optional[EmbeddingCache] = None
+
+    def get_embedding(self, text: str) -> List[float]:
+        cache = self.cache or get_embedding_cache()
+        client = self.client
+        endpoint = "embed" if hasattr(client, "embed") else "embeddings"
+        model = cache_model(self.id, endpoint)
+        vector = cache.get(model, self.dimensions, text)
+        if vector is not None:
+            return vector
+        if endpoint == "embed":
+            try:
+                vector = list(client.embed(model=self.id, input=text)["embeddings"][0])
+            except Exception as e:
+                print(f"⚠️ Embedding Ollama impossible: {str(e)}")
+                vector = []
+        else:
+            # Anciennes versions du client : /api/embeddings, comme le chargeur
+            vector = super().get_embedding(text)
+        if vector:
+            cache.put(model, self.dimensions, text, vector)
+        return vector
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspection du cache d'embeddings")
+    parser.add_argument("command", choices=["stats", "evict", "clear"])
+    args = parser.parse_args()
+
+    cache = EmbeddingCache()
+    if args.command == "evict":
+        cache.evict()
+    elif args.command == "clear":
+        cache.clear()
+    stats = cache.stats()
+    print(f"📁 Cache: {stats['path']}")
+    print(f"   Entrées: {stats['entries']} / {stats['max_entries']}")
+    print(f"   Succès: {stats['total_hits']}, échecs: {stats['total_misses']} "
+          f"(taux de succès {stats['total_hit_rate']:.0%}, cumulé depuis la création du cache)")
+
+
+if __name__ == "__main__":
+    main()
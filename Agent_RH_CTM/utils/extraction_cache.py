@@ -0,0 +1,154 @@
+import argparse
+import hashlib
+import os
+import threading
+from pathlib import Path
+from utils.env_config import get_config
+
+# Emplacement et taille maximale du cache d'extraction
+cache_dir = Path(get_config("EXTRACTION_CACHE_DIR", "./.cache/extraction"))
+cache_max_mb = float(get_config("EXTRACTION_CACHE_MAX_MB", "500"))
+
+
+def file_sha256(file_path):
+    """Calcule l'empreinte SHA-256 du contenu d'un fichier"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """Cache disque des textes extraits, adressé par le contenu du fichier et la version du prompt.
+
+    Chaque entrée est un fichier <sha256>-<version>.txt. La date de modification
+    sert de date de dernier accès pour l'éviction LRU.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = Path(directory or cache_dir)
+        self.max_bytes = int(max_bytes if max_bytes is not None else cache_max_mb * 1024 * 1024)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Taille totale connue, recalculée lors d'un nettoyage
+        self.size_bytes = None
+
+    def entry_path(self, file_hash, prompt_version):
+        return self.directory / f"{file_hash}-{prompt_version}.txt"
+
+    def get(self, file_hash, prompt_version):
+        """Retourne le texte en cache ou None. Un accès rafraîchit la position LRU."""
+        path = self.entry_path(file_hash, prompt_version)
+        try:
+            content = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return content
+
+    def put(self, file_hash, prompt_version, content):
+        """Enregistre un texte extrait puis applique la limite de taille"""
+        path = self.entry_path(file_hash, prompt_version)
+        tmp_path = path.with_suffix(f".tmp{threading.get_ident()}")
+        tmp_path.write_text(content, encoding="utf-8")
+        with self.lock:
+            # Une entrée réécrite remplace l'ancienne : seule la différence de taille compte
+            try:
+                previous_size = path.stat().st_size
+            except FileNotFoundError:
+                previous_size = 0
+            os.replace(tmp_path, path)
+            if self.size_bytes is None:
+                self.size_bytes = sum(size for _, size, _ in self.entries())
+            else:
+                self.size_bytes += path.stat().st_size - previous_size
+            over_limit = self.size_bytes > self.max_bytes
+        if over_limit:
+            self.prune()
+
+    def entries(self):
+        """Liste les entrées (chemin, taille, dernier accès), de la plus ancienne à la plus récente"""
+        entries = []
+        for path in self.directory.glob("*.txt"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        entries.sort(key=lambda entry: entry[2])
+        return entries
+
+    def prune(self, max_bytes=None):
+        """Supprime les entrées les moins récemment utilisées au-delà de la taille maximale.
+
+        Retourne le nombre d'entrées et d'octets supprimés.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        with self.lock:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            removed, freed = 0, 0
+            for path, size, _ in entries:
+                if total <= max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+                freed += size
+            self.size_bytes = total
+        return removed, freed
+
+    def clear(self):
+        """Vide entièrement le cache"""
+        return self.prune(max_bytes=0)
+
+    def stats(self):
+        """Retourne les statistiques du cache"""
+        entries = self.entries()
+        return {
+            "directory": str(self.directory),
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspection et nettoyage du cache d'extraction des CV")
+    parser.add_argument("command", choices=["stats", "list", "prune", "clear"])
+    parser.add_argument("--max-mb", type=float, default=None,
+                        help="Taille cible en Mo pour la commande prune (défaut: EXTRACTION_CACHE_MAX_MB)")
+    args = parser.parse_args()
+
+    cache = ExtractionCache()
+    if args.command == "stats":
+        stats = cache.stats()
+        print(f"📁 Cache: {stats['directory']}")
+        print(f"   Entrées: {stats['entries']}")
+        print(f"   Taille: {stats['size_bytes'] / (1024 * 1024):.1f} Mo / {stats['max_bytes'] / (1024 * 1024):.1f} Mo")
+    elif args.command == "list":
+        for path, size, _ in reversed(cache.entries()):
+            print(f"{path.name}\t{size / 1024:.1f} KB")
+    elif args.command == "prune":
+        max_bytes = int(args.max_mb * 1024 * 1024) if args.max_mb is not None else None
+        removed, freed = cache.prune(max_bytes=max_bytes)
+        print(f"🧹 {removed} entrée(s) supprimée(s), {freed / (1024 * 1024):.1f} Mo libéré(s)")
+    elif args.command == "clear":
+        removed, freed = cache.clear()
+        print(f"🧹 Cache vidé: {removed} entrée(s), {freed / (1024 * 1024):.1f} Mo libéré(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from utils.env_config import get_config
+from utils.cv_fields import extract_cv_fields
+
+# Paramètres du chargement parallèle
+loader_processes = int(get_config("KB_LOADER_PROCESSES", str(max(1, (os.cpu_count() or 2) - 1))))
+embed_batch_size = int(get_config("KB_EMBED_BATCH_SIZE", "32"))
+embed_concurrency = int(get_config("KB_EMBED_CONCURRENCY", "4"))
+write_batch_rows = int(get_config("KB_WRITE_BATCH_ROWS", "2048"))
+ollama_host = get_config("OLLAMA_HOST", None)
+
+# Colonnes typées stockées à côté de chaque vecteur pour le pré-filtrage
+metadata_columns = [
+    "source", "reception_date", "candidate_name", "city", "phone", "email", "experience_years",
+    "document_type", "candidate_id", "file_path",
+]
+
+
+def read_and_chunk(path, overlap=15):
+    """Lit un fichier texte et le découpe comme le fait TextKnowledgeBase (exécuté dans un processus fils).
+
+    Retourne une liste de dictionnaires sérialisables {name, content, meta_data, fields}.
+    Les champs structurés sont extraits du document entier et recopiés sur chaque chunk.
+    """
+    from agno.document.chunking.fixed import FixedSizeChunking
+    from agno.document.reader.text_reader import TextReader
+
+    path = Path(path)
+    reader = TextReader(chunking_strategy=FixedSizeChunking(overlap=overlap))
+    documents = reader.read(file=path)
+    fields = extract_cv_fields(path.read_text(encoding="utf-8"), source=path.stem)
+    return [
+        {"name": document.name, "content": document.content, "meta_data": document.meta_data, "fields": fields}
+        for document in documents
+    ]
+
+
+class OllamaBatchEmbedder:
+    """Client d'embedding Ollama qui vectorise plusieurs textes par requête"""
+
+    def __init__(self, id="nomic-embed-text", dimensions=768, host=None):
+        from ollama import Client
+
+        self.id = id
+        self.dimensions = dimensions
+        self.client = Client(host=host or ollama_host)
+        # Point d'accès utilisé, qui fait partie de la clé du cache d'embeddings
+        self.endpoint = "embed" if hasattr(self.client, "embed") else "embeddings"
+
+    def embed_batch(self, texts):
+        if self.endpoint == "embed":
+            response = self.client.embed(model=self.id, input=list(texts))
+            return [list(vector) for vector in response["embeddings"]]
+        # Anciennes versions du client : une requête par texte
+        return [self.client.embeddings(model=self.id, prompt=text)["embedding"] for text in texts]
+
+
+class HashEmbedder:
+    """Embedder local déterministe (sans réseau) pour les essais et les mesures du chargeur"""
+
+    def __init__(self, id="hash-embedder", dimensions=768, delay=0.0):
+        self.id = id
+        self.dimensions = dimensions
+        self.delay = delay
+
+    def embed_batch(self, texts):
+        if self.delay:
+            time.sleep(self.delay)
+        vectors = []
+        for text in texts:
+            seed = hashlib.sha256(text.encode("utf-8")).digest()
+            values = [(seed[i % len(seed)] - 127.5) / 127.5 for i in range(self.dimensions)]
+            norm = math.sqrt(sum(value * value for value in values)) or 1.0
+            vectors.append([value / norm for value in values])
+        return vectors
+
+
+def cvs_schema(dimensions):
+    """Schéma Arrow de la table 'cvs' : colonnes d'agno LanceDb (vector, id, payload) et métadonnées typées"""
+    import pyarrow as pa
+
+    return pa.schema([
+        pa.field("vector", pa.list_(pa.float32(), dimensions)),
+        pa.field("id", pa.string()),
+        pa.field("payload", pa.string()),
+        pa.field("source", pa.string()),
+        pa.field("reception_date", pa.timestamp("s")),
+        pa.field("candidate_name", pa.string()),
+        pa.field("city", pa.string()),
+        pa.field("phone", pa.string()),
+        pa.field("email", pa.string()),
+        pa.field("experience_years", pa.float32()),
+        pa.field("document_type", pa.string()),
+        pa.field("candidate_id", pa.string()),
+        pa.field("file_path", pa.string()),
+    ])
+
+
+def empty_rows():
+    return {column: [] for column in ["vector", "id", "payload"] + metadata_columns}
+
+
+def build_rows(chunks, vectors):
+    """Construit les lignes de la table au format attendu par agno (id = md5 du contenu, payload JSON)"""
+    rows = empty_rows()
+    for chunk, vector in zip(chunks, vectors):
+        content = chunk["content"].replace("\x00", "\ufffd")
+        payload = {"name": chunk["name"], "meta_data": chunk["meta_data"], "content": content, "usage": None}
+        rows["vector"].append(vector)
+        rows["id"].append(hashlib.md5(content.encode()).hexdigest())
+        rows["payload"].append(json.dumps(payload))
+        fields = chunk.get("fields") or {}
+        for column in metadata_columns:
+            rows[column].append(fields.get(column))
+        if rows["source"][-1] is None:
+            rows["source"][-1] = chunk["name"]
+    return rows
+
+
+class StageStats:
+    """Mesure le débit d'une étape du pipeline (éléments traités sur la durée active de l'étape)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.started_at = None
+        self.ended_at = None
+        self.lock = threading.Lock()
+
+    def record(self, items, started_at, ended_at):
+        with self.lock:
+            self.items += items
+            self.started_at = started_at if self.started_at is None else min(self.started_at, started_at)
+            self.ended_at = ended_at if self.ended_at is None else max(self.ended_at, ended_at)
+
+    @property
+    def seconds(self):
+        if self.started_at is None:
+            return 0.0
+        return self.ended_at - self.started_at
+
+    def summary(self):
+        rate = self.items / self.seconds if self.seconds > 0 else 0.0
+        return f"{self.name}: {self.items} chunk(s) en {self.seconds:.1f}s ({rate:.1f} chunks/s)"
+
+
+class ParallelLoader:
+    """Chargeur parallèle de la table 'cvs'.
+
+    Lecture et découpage dans un pool de processus, embeddings par lots avec
+    plusieurs requêtes simultanées, écriture en gros lots Arrow. Avec une table
+    d'identité, chaque document est rattaché à un candidat (colonne candidate_id).
+    """
+
+    def __init__(self, table, embedder=None, processes=None, batch_size=None, concurrency=None, write_rows=None,
+                 registry=None):
+        self.table = table
+        self.registry = registry
+        self.merges = []
+        self.embedder = embedder or OllamaBatchEmbedder()
+        self.processes = processes or loader_processes
+        self.batch_size = batch_size or embed_batch_size
+        self.concurrency = concurrency or embed_concurrency
+        self.write_rows = write_rows or write_batch_rows
+        self.stats = {name: StageStats(name) for name in ("Découpage", "Embedding", "Écriture")}
+
+    def assign_candidate(self, source, chunks):
+        """Résout le candidat du document et l'inscrit sur tous ses chunks"""
+        if self.registry is None or not chunks:
+            return
+        candidate_id, merged = self.registry.resolve(source, chunks[0]["fields"])
+        if merged:
+            self.merges.append((merged, candidate_id))
+        for chunk in chunks:
+            chunk["fields"] = {**chunk["fields"], "candidate_id": candidate_id}
+
+    def embed(self, chunks):
+        started_at = time.monotonic()
+        vectors = self.embedder.embed_batch([chunk["content"] for chunk in chunks])
+        self.stats["Embedding"].record(len(chunks), started_at, time.monotonic())
+        return chunks, vectors
+
+    def write(self, rows):
+        """Écrit un lot de lignes dans LanceDB sous forme de RecordBatch Arrow"""
+        import pyarrow as pa
+
+        if not rows["id"]:
+            return
+        started_at = time.monotonic()
+        batch = pa.RecordBatch.from_pydict(rows, schema=cvs_schema(self.embedder.dimensions))
+        self.table.add(pa.Table.from_batches([batch]))
+        self.stats["Écriture"].record(len(rows["id"]), started_at, time.monotonic())
+
+    def load(self, paths):
+        """Charge les fichiers donnés. Retourne {nom du document: nombre de chunks}."""
+        paths = [str(path) for path in paths]
+        chunk_counts = {}
+        pending_chunks = []
+        buffer = empty_rows()
+        in_flight = set()
+
+        def collect(done):
+            for future in done:
+                chunks, vectors = future.result()
+                rows = build_rows(chunks, vectors)
+                for key in buffer:
+                    buffer[key].extend(rows[key])
+            if len(buffer["id"]) >= self.write_rows:
+                self.write(buffer)
+                for key in buffer:
+                    buffer[key] = []
+
+        def submit(chunks):
+            # Limiter le nombre de requêtes d'embedding simultanées
+            while len(in_flight) >= self.concurrency:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                in_flight.difference_update(done)
+                collect(done)
+            in_flight.add(embed_pool.submit(self.embed, chunks))
+
+        with ProcessPoolExecutor(max_workers=self.processes) as chunk_pool, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as embed_pool:
+            started_at = time.monotonic()
+            for path, chunks in zip(paths, chunk_pool.map(read_and_chunk, paths, chunksize=4)):
+                self.stats["Découpage"].record(len(chunks), started_at, time.monotonic())
+                chunk_counts[Path(path).stem] = len(chunks)
+                self.assign_candidate(Path(path).stem, chunks)
+                pending_chunks.extend(chunks)
+                while len(pending_chunks) >= self.batch_size:
+                    submit(pending_chunks[:self.batch_size])
+                    pending_chunks = pending_chunks[self.batch_size:]
+            if pending_chunks:
+                submit(pending_chunks)
+            done, _ = wait(in_flight)
+            collect(done)
+
+        self.write(buffer)
+        if self.merges:
+            # Fusions de candidats : les chunks écrits avec un ancien identifiant prennent le nouveau
+            from utils.candidate_identity import relabel_candidates
+
+            for merged, candidate_id in self.merges:
+                relabel_candidates(self.table, merged, candidate_id)
+            print(f"👥 {len(self.merges)} fusion(s) de candidats reportée(s) dans la table")
+            self.merges = []
+        return chunk_counts
+
+    def report(self):
+        """Affiche le débit de chaque étape"""
+        for stage in self.stats.values():
+            print(f"   {stage.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure du chargeur parallèle sur une table de test")
+    parser.add_argument("directory", nargs="?", default="./txt")
+    parser.add_argument("--uri", default="/tmp/lancedb_loader_bench", help="Base LanceDB de test")
+    parser.add_argument("--fake-embedder", action="store_true", help="Utiliser l'embedder local sans Ollama")
+    args = parser.parse_args()
+
+    import lancedb
+
+    embedder = HashEmbedder() if args.fake_embedder else OllamaBatchEmbedder()
+    connection = lancedb.connect(args.uri)
+    table = connection.create_table("cvs", schema=cvs_schema(embedder.dimensions), mode="overwrite")
+    loader = ParallelLoader(table, embedder=embedder)
+    counts = loader.load(sorted(Path(args.directory).glob("*.txt")))
+    print(f"📚 {len(counts)} document(s), {sum(counts.values())} chunk(s) chargés dans {args.uri}")
+    loader.report()
+
+
+if __name__ == "__main__":
+    main()
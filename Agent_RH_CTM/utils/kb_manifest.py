@@ -0,0 +1,76 @@
+import json
+import os
+from pathlib import Path
+from utils.extraction_cache import file_sha256
+
+
+class KnowledgeManifest:
+    """Manifeste des documents déjà chargés dans la base de connaissances.
+
+    Pour chaque fichier (chemin relatif) on mémorise sa taille, sa date de
+    modification et l'empreinte de son contenu. Le manifeste est enregistré en
+    JSON et survit aux redémarrages.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.documents = {}
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    self.documents = json.load(file).get("documents", {})
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Manifeste illisible ({self.path}), reconstruction complète: {str(e)}")
+                self.documents = {}
+
+    def scan(self, directory, pattern="*.txt"):
+        """Compare le dossier au manifeste.
+
+        Retourne un dictionnaire {added, updated, removed, unchanged} de listes de
+        chemins relatifs. Le hachage n'est calculé que si la taille ou la date a changé.
+        """
+        directory = Path(directory)
+        changes = {"added": [], "updated": [], "removed": [], "unchanged": []}
+        seen = set()
+
+        for file in sorted(directory.glob(pattern)):
+            if not file.is_file():
+                continue
+            key = file.relative_to(directory).as_posix()
+            seen.add(key)
+            stat = file.stat()
+            entry = self.documents.get(key)
+
+            if entry is None:
+                changes["added"].append(key)
+            elif entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                changes["unchanged"].append(key)
+            elif entry["sha256"] == file_sha256(file):
+                # Fichier touché mais contenu identique : mettre à jour la date seulement
+                entry["mtime"] = stat.st_mtime
+                changes["unchanged"].append(key)
+            else:
+                changes["updated"].append(key)
+
+        changes["removed"] = sorted(key for key in self.documents if key not in seen)
+        return changes
+
+    def record(self, directory, key, **extra):
+        """Enregistre l'état actuel d'un fichier après son chargement"""
+        file = Path(directory) / key
+        stat = file.stat()
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": file_sha256(file)}
+        entry.update(extra)
+        self.documents[key] = entry
+
+    def forget(self, key):
+        """Retire un fichier du manifeste"""
+        self.documents.pop(key, None)
+
+    def save(self):
+        """Écrit le manifeste de façon atomique"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"version": 1, "documents": self.documents}, file, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
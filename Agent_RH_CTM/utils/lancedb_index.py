@@ -0,0 +1,162 @@
+import json
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from utils.env_config import get_config
+
+# Seuils de construction des index de la table 'cvs'
+ann_min_rows = int(get_config("LANCEDB_ANN_MIN_ROWS", "5000"))
+ann_rebuild_growth = float(get_config("LANCEDB_ANN_REBUILD_GROWTH", "2.0"))
+index_state_path = Path(get_config("LANCEDB_INDEX_STATE_PATH", "./lancedb/cvs_indexes.json"))
+fts_column = "payload"
+vector_column = "vector"
+# Verrou partagé par tous les gestionnaires du processus : l'API en crée un par opération
+_index_lock = threading.Lock()
+
+
+class IndexManager:
+    """Gère l'index vectoriel ANN (IVF-PQ) et l'index plein texte de la table LanceDB.
+
+    - L'index ANN est construit dès que la table dépasse ann_min_rows lignes, puis
+      reconstruit quand la table a grossi d'un facteur ann_rebuild_growth. Entre
+      deux reconstructions, les nouvelles lignes sont intégrées par optimisation.
+    - L'index FTS, dont dépend la recherche hybride, est reconstruit dès que les
+      données ont changé depuis le dernier passage du gestionnaire.
+
+    L'état est enregistré en JSON pour être consulté par l'API.
+    """
+
+    def __init__(self, table, state_path=None, dimensions=768):
+        self.table = table
+        self.state_path = Path(state_path or index_state_path)
+        self.dimensions = dimensions
+        self.lock = _index_lock
+
+    def load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def save_state(self, state):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.state_path)
+
+    def refresh_table(self):
+        """Recharge la dernière version de la table (écrite éventuellement par un autre processus)"""
+        if hasattr(self.table, "checkout_latest"):
+            try:
+                self.table.checkout_latest()
+            except Exception:
+                pass
+
+    def list_indices(self):
+        try:
+            return [
+                {"name": getattr(index, "name", None), "type": str(getattr(index, "index_type", "")),
+                 "columns": list(getattr(index, "columns", []))}
+                for index in self.table.list_indices()
+            ]
+        except Exception:
+            return []
+
+    def has_index(self, column):
+        return any(column in index["columns"] for index in self.list_indices())
+
+    def build_vector_index(self, rows):
+        """Construit l'index IVF-PQ (distance cosinus) adapté au nombre de lignes"""
+        num_partitions = max(1, int(math.sqrt(rows)))
+        # Le nombre de sous-vecteurs doit diviser la dimension
+        num_sub_vectors = next(n for n in (96, 64, 48, 32, 16, 8, 4, 2, 1) if self.dimensions % n == 0)
+        self.table.create_index(
+            metric="cosine",
+            vector_column_name=vector_column,
+            num_partitions=num_partitions,
+            num_sub_vectors=num_sub_vectors,
+            replace=True,
+        )
+        return {"num_partitions": num_partitions, "num_sub_vectors": num_sub_vectors}
+
+    def optimize_vector_index(self):
+        """Intègre les nouvelles lignes dans l'index vectoriel existant"""
+        if hasattr(self.table, "to_lance"):
+            self.table.to_lance().optimize.optimize_indices()
+        else:
+            self.table.optimize()
+
+    def build_fts_index(self):
+        self.table.create_fts_index(fts_column, replace=True)
+
+    def ensure_indexes(self, force=False):
+        """Construit ou met à jour les index si nécessaire. Retourne l'état."""
+        with self.lock:
+            self.refresh_table()
+            state = self.load_state()
+            rows = self.table.count_rows()
+            # Les index créent eux-mêmes des versions : on compare à la version laissée au dernier passage
+            data_changed = self.table.version != state.get("table_version")
+            now = datetime.now().isoformat()
+
+            # Index vectoriel ANN
+            vector_state = state.get("vector", {})
+            indexed_rows = vector_state.get("rows", 0)
+            has_vector_index = self.has_index(vector_column) or bool(vector_state.get("built_at"))
+            try:
+                if rows >= ann_min_rows and (force or not has_vector_index or rows >= indexed_rows * ann_rebuild_growth):
+                    started_at = time.perf_counter()
+                    params = self.build_vector_index(rows)
+                    vector_state = {"rows": rows, "built_at": now,
+                                    "seconds": round(time.perf_counter() - started_at, 2), **params}
+                    print(f"🧭 Index vectoriel IVF-PQ construit sur {rows} lignes ({vector_state['seconds']}s)")
+                elif has_vector_index and data_changed:
+                    self.optimize_vector_index()
+                    vector_state["optimized_at"] = now
+                vector_state.pop("error", None)
+            except Exception as e:
+                print(f"❌ Erreur lors de la mise à jour de l'index vectoriel: {str(e)}")
+                vector_state["error"] = str(e)
+
+            # Index plein texte (recherche hybride)
+            fts_state = state.get("fts", {})
+            try:
+                if rows and (force or data_changed or not fts_state.get("built_at")):
+                    started_at = time.perf_counter()
+                    self.build_fts_index()
+                    fts_state = {"rows": rows, "built_at": now,
+                                 "seconds": round(time.perf_counter() - started_at, 2)}
+                    print(f"🔤 Index plein texte reconstruit sur {rows} lignes ({fts_state['seconds']}s)")
+                fts_state.pop("error", None)
+            except Exception as e:
+                print(f"❌ Erreur lors de la mise à jour de l'index plein texte: {str(e)}")
+                fts_state["error"] = str(e)
+
+            state = {
+                "rows": rows,
+                "table_version": self.table.version,
+                "checked_at": now,
+                "ann_min_rows": ann_min_rows,
+                "vector": vector_state,
+                "fts": fts_state,
+            }
+            self.save_state(state)
+            return state
+
+    def status(self):
+        """État des index pour l'API d'administration"""
+        state = self.load_state()
+        try:
+            self.refresh_table()
+            state["current_rows"] = self.table.count_rows()
+            state["current_version"] = self.table.version
+            state["stale"] = state.get("table_version") != state["current_version"]
+        except Exception as e:
+            state["error"] = str(e)
+        state["indices"] = self.list_indices()
+        return state
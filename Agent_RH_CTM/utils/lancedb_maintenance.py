@@ -0,0 +1,112 @@
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from utils.env_config import get_config
+from utils.lancedb_index import IndexManager
+
+# Paramètres de maintenance de la table 'cvs'
+lancedb_uri = get_config("LANCEDB_URI", "lancedb")
+table_name = "cvs"
+retention_days = float(get_config("LANCEDB_RETENTION_DAYS", "7"))
+maintenance_interval_hours = float(get_config("LANCEDB_MAINTENANCE_INTERVAL_HOURS", "24"))
+
+
+def open_cvs_table(uri=None):
+    """Ouvre la table 'cvs' avec une connexion dédiée"""
+    import lancedb
+
+    return lancedb.connect(uri or lancedb_uri).open_table(table_name)
+
+
+def directory_size(path):
+    """Taille totale en octets d'un dossier"""
+    return sum(file.stat().st_size for file in Path(path).rglob("*") if file.is_file())
+
+
+def table_path(uri=None):
+    return Path(uri or lancedb_uri) / f"{table_name}.lance"
+
+
+def count_versions(table):
+    try:
+        return len(table.list_versions())
+    except Exception:
+        return None
+
+
+def probe_latency(table, runs=5):
+    """Mesure la latence médiane (ms) d'une recherche vectorielle sur un vecteur de la table"""
+    try:
+        sample = table.head(1).to_pylist()
+        if not sample:
+            return None
+        vector = sample[0]["vector"]
+        durations = []
+        for _ in range(runs):
+            started_at = time.perf_counter()
+            table.search(vector, vector_column_name="vector").limit(10).to_list()
+            durations.append((time.perf_counter() - started_at) * 1000)
+        return round(statistics.median(durations), 2)
+    except Exception as e:
+        print(f"Mesure de latence impossible: {str(e)}")
+        return None
+
+
+def run_maintenance(table=None, uri=None, retention=None):
+    """Compacte les fragments, supprime les versions plus anciennes que la rétention et ré-optimise les index.
+
+    Retourne un rapport avec les octets récupérés et la latence avant/après.
+    """
+    table = table or open_cvs_table(uri)
+    retention = timedelta(days=retention_days) if retention is None else retention
+    path = table_path(uri)
+
+    size_before = directory_size(path)
+    versions_before = count_versions(table)
+    latency_before = probe_latency(table)
+    started_at = time.perf_counter()
+
+    if hasattr(table, "optimize"):
+        # Compactage + nettoyage des versions + optimisation des index en un seul appel
+        table.optimize(cleanup_older_than=retention)
+    else:
+        table.compact_files()
+        table.cleanup_old_versions(older_than=retention)
+
+    # L'index plein texte et l'état des index doivent suivre la nouvelle version
+    IndexManager(table).ensure_indexes()
+
+    size_after = directory_size(path)
+    report = {
+        "finished_at": datetime.now().isoformat(),
+        "seconds": round(time.perf_counter() - started_at, 2),
+        "size_before": size_before,
+        "size_after": size_after,
+        "reclaimed_bytes": size_before - size_after,
+        "versions_before": versions_before,
+        "versions_after": count_versions(table),
+        "latency_before_ms": latency_before,
+        "latency_after_ms": probe_latency(table),
+    }
+    print(f"🧹 Maintenance LanceDB: {report['reclaimed_bytes'] / (1024 * 1024):.1f} Mo récupéré(s) "
+          f"({size_before / (1024 * 1024):.1f} → {size_after / (1024 * 1024):.1f} Mo), "
+          f"versions {report['versions_before']} → {report['versions_after']}, "
+          f"latence {report['latency_before_ms']} → {report['latency_after_ms']} ms "
+          f"en {report['seconds']}s")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compactage et nettoyage des versions de la table LanceDB 'cvs'")
+    parser.add_argument("--uri", default=lancedb_uri, help="Dossier de la base LanceDB")
+    parser.add_argument("--retention-days", type=float, default=retention_days,
+                        help="Conserver les versions plus récentes que ce nombre de jours")
+    args = parser.parse_args()
+
+    run_maintenance(uri=args.uri, retention=timedelta(days=args.retention_days))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import hashlib
+import random
+import re
+from collections import defaultdict
+from utils.cv_fields import excel_name_pattern, normalize_text, reception_pattern
+from utils.env_config import get_config
+
+# Similarité (Jaccard estimée) à partir de laquelle un texte est un quasi-doublon.
+# 0.9 : un renvoi qui modifie moins de ~10 % du CV n'est pas revectorisé.
+near_duplicate_threshold = float(get_config("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+shingle_size = 5
+num_perm = 64
+# 16 bandes de 4 lignes : les paires au-delà de ~0.5 de similarité tombent dans un même seau
+lsh_bands = 16
+min_shingles = 20
+
+_mersenne_prime = (1 << 61) - 1
+_max_hash = (1 << 32) - 1
+_random = random.Random(20240827)
+_permutations = [
+    (_random.randint(1, _mersenne_prime - 1), _random.randint(0, _mersenne_prime - 1)) for _ in range(num_perm)
+]
+
+
+def comparable_text(text):
+    """Texte normalisé sans la date de réception ajoutée à l'extraction (elle change à chaque envoi)"""
+    text = reception_pattern.sub(" ", text or "")
+    return normalize_text(re.sub(r"[^\w@.+-]+", " ", text))
+
+
+def shingles(text, size=shingle_size):
+    words = comparable_text(text).split()
+    if len(words) < size:
+        return set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(text):
+    """Signature MinHash du texte, ou None s'il est trop court ou s'il s'agit d'une ligne de suivi Excel"""
+    if excel_name_pattern.search(text or ""):
+        return None
+    values = shingles(text)
+    if len(values) < min_shingles:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+              for value in values]
+    return [
+        min(((a * value + b) % _mersenne_prime) & _max_hash for value in hashes)
+        for a, b in _permutations
+    ]
+
+
+def similarity(signature_a, signature_b):
+    """Estimation de la similarité de Jaccard entre deux signatures"""
+    if not signature_a or not signature_b or len(signature_a) != len(signature_b):
+        return 0.0
+    return sum(1 for a, b in zip(signature_a, signature_b) if a == b) / len(signature_a)
+
+
+class NearDuplicateIndex:
+    """Index LSH (seaux par bandes de signature MinHash) des documents chargés"""
+
+    def __init__(self, bands=lsh_bands):
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets = defaultdict(set)
+        self.signatures = {}
+
+    @classmethod
+    def from_manifest(cls, documents):
+        """Index des documents canoniques du manifeste (les quasi-doublons liés n'y figurent pas)"""
+        index = cls()
+        for key, entry in documents.items():
+            if entry.get("minhash") and not entry.get("duplicate_of"):
+                index.add(key, entry["minhash"])
+        return index
+
+    def band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, key, signature):
+        if not signature:
+            return
+        self.remove(key)
+        self.signatures[key] = signature
+        for band_key in self.band_keys(signature):
+            self.buckets[band_key].add(key)
+
+    def remove(self, key):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self.band_keys(signature):
+            self.buckets[band_key].discard(key)
+
+    def find(self, signature, threshold=None, exclude=None):
+        """Retourne (clé, similarité) du document le plus proche au-delà du seuil, ou None"""
+        if not signature:
+            return None
+        threshold = near_duplicate_threshold if threshold is None else threshold
+        candidates = set()
+        for band_key in self.band_keys(signature):
+            candidates |= self.buckets.get(band_key, set())
+        candidates.discard(exclude)
+        best = None
+        for key in candidates:
+            score = similarity(signature, self.signatures[key])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
@@ -0,0 +1,68 @@
+import re
+from utils.env_config import get_config
+
+# pypdf est optionnel : sans lui, tous les PDF passent par le modèle
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+# Seuils de qualité du texte embarqué
+min_chars = int(get_config("PDF_TEXT_MIN_CHARS", "300"))
+min_printable_ratio = float(get_config("PDF_TEXT_MIN_PRINTABLE_RATIO", "0.95"))
+min_letter_ratio = float(get_config("PDF_TEXT_MIN_LETTER_RATIO", "0.5"))
+
+
+def extract_pdf_text(file_path):
+    """Extrait la couche texte d'un PDF. Retourne None si le PDF n'est pas lisible localement."""
+    if PdfReader is None:
+        return None
+    try:
+        reader = PdfReader(str(file_path))
+        pages = [page.extract_text() or "" for page in reader.pages]
+    except Exception as e:
+        print(f"Lecture locale impossible pour {file_path}: {str(e)}")
+        return None
+    return clean_text("\n\n".join(pages))
+
+
+def clean_text(text):
+    """Normalise les espaces et supprime les lignes vides en excès"""
+    text = text.replace("\x00", "")
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def text_quality(text):
+    """Calcule des indicateurs de qualité : nombre de caractères, part imprimable et part de lettres"""
+    if not text:
+        return {"chars": 0, "printable_ratio": 0.0, "letter_ratio": 0.0}
+    visible = [c for c in text if not c.isspace()]
+    printable = sum(1 for c in text if c.isprintable() or c in "\n\t")
+    letters = sum(1 for c in visible if c.isalpha())
+    return {
+        "chars": len(visible),
+        "printable_ratio": printable / len(text),
+        "letter_ratio": letters / len(visible) if visible else 0.0,
+    }
+
+
+def is_good_text(text):
+    """Indique si le texte embarqué est suffisant pour se passer du modèle"""
+    quality = text_quality(text)
+    return (
+        quality["chars"] >= min_chars
+        and quality["printable_ratio"] >= min_printable_ratio
+        and quality["letter_ratio"] >= min_letter_ratio
+    )
+
+
+def local_text_or_none(file_path):
+    """Retourne le texte d'un PDF numérique s'il passe l'heuristique de qualité, sinon None"""
+    if str(file_path).lower().endswith(".pdf"):
+        text = extract_pdf_text(file_path)
+        if text and is_good_text(text):
+            return text
+    return None
@@ -0,0 +1,225 @@
+import re
+from calendar import monthrange
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import List, Optional
+
+from utils.cv_fields import find_city, normalize_text
+from utils.cv_store import build_where
+
+FRENCH_MONTHS = {
+    "janvier": 1, "fevrier": 2, "mars": 3, "avril": 4, "mai": 5, "juin": 6, "juillet": 7,
+    "aout": 8, "septembre": 9, "octobre": 10, "novembre": 11, "decembre": 12,
+}
+MONTHS_PATTERN = "|".join(FRENCH_MONTHS)
+
+# Intitulés de poste fréquents (nom canonique -> variantes normalisées)
+JOB_TITLES = {
+    "chauffeur": ["chauffeur", "conducteur", "driver", "chauffeur poids lourd", "conducteur de bus", "autocar"],
+    "mécanicien": ["mecanicien", "mecanique"],
+    "électricien": ["electricien", "electricite"],
+    "technicien": ["technicien"],
+    "comptable": ["comptable", "comptabilite"],
+    "commercial": ["commercial", "vendeur", "attache commercial"],
+    "agent d'accueil": ["agent d'accueil", "hotesse", "accueil"],
+    "caissier": ["caissier", "guichetier"],
+    "magasinier": ["magasinier", "logisticien", "logistique"],
+    "manutentionnaire": ["manutentionnaire", "bagagiste"],
+    "contrôleur": ["controleur", "receveur"],
+    "secrétaire": ["secretaire", "assistante administrative", "assistant administratif"],
+    "informaticien": ["informaticien", "developpeur", "ingenieur informatique", "technicien informatique"],
+    "ingénieur": ["ingenieur"],
+    "agent de sécurité": ["agent de securite", "gardien", "vigile"],
+}
+
+numeric_date_pattern = re.compile(r"\b(\d{1,2})[/.-](\d{1,2})[/.-](\d{2,4})\b")
+text_date_pattern = re.compile(rf"\b(1er|\d{{1,2}})\s+({MONTHS_PATTERN})(?:\s+(\d{{4}}))?\b")
+month_pattern = re.compile(rf"\b({MONTHS_PATTERN})(?:\s+(\d{{4}}))?\b")
+numeric_month_pattern = re.compile(r"\b(\d{1,2})[/-](\d{4})\b")
+year_pattern = re.compile(r"\b(20\d{2})\b")
+last_days_pattern = re.compile(r"\b(\d{1,3})\s+derniers?\s+jours\b")
+
+experience_range_pattern = re.compile(r"entre\s+(\d{1,2})\s+et\s+(\d{1,2})\s+(?:ans|annees)")
+experience_min_pattern = re.compile(
+    r"(?:plus de|au moins|minimum|min\.?|superieure? a|>=?)\s*(\d{1,2})\s*(?:ans|annees)"
+    r"|(\d{1,2})\s*(?:\+\s*)?(?:ans|annees)\s*(?:d'?\s*|de\s+)?experience"
+)
+experience_max_pattern = re.compile(r"(?:moins de|pas plus de|maximum|max\.?|au plus|<=?)\s*(\d{1,2})\s*(?:ans|annees)")
+# Qualificatif de maximum juste avant un nombre d'années ("moins de 5 ans d'expérience")
+max_qualifier_pattern = re.compile(r"(?:moins de|pas plus de|maximum|max\.?|au plus|<=?)\s*$")
+
+
+@dataclass
+class QueryPlan:
+    """Plan de recherche déterministe extrait d'une question RH"""
+
+    question: str
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    city: Optional[str] = None
+    min_experience: Optional[float] = None
+    max_experience: Optional[float] = None
+    job_titles: List[str] = field(default_factory=list)
+    search_terms: List[str] = field(default_factory=list)
+
+    @property
+    def has_filters(self) -> bool:
+        return any(value is not None for value in (
+            self.date_from, self.date_to, self.city, self.min_experience, self.max_experience
+        ))
+
+    @property
+    def search_text(self) -> str:
+        """Texte de la recherche hybride (vide : simple parcours des lignes filtrées)"""
+        return " ".join(self.search_terms)
+
+    @property
+    def where(self) -> Optional[str]:
+        return build_where(
+            date_from=self.date_from,
+            date_to=self.date_to,
+            city=self.city,
+            min_experience=self.min_experience,
+            max_experience=self.max_experience,
+        )
+
+    def describe(self) -> str:
+        """Résumé lisible des filtres appliqués"""
+        parts = []
+        if self.date_from or self.date_to:
+            start = self.date_from.strftime("%d/%m/%Y") if self.date_from else "…"
+            end = self.date_to.strftime("%d/%m/%Y") if self.date_to else "…"
+            parts.append(f"reçus le {start}" if start == end else f"reçus du {start} au {end}")
+        if self.city:
+            parts.append(f"ville = {self.city}")
+        if self.min_experience is not None:
+            parts.append(f"expérience ≥ {self.min_experience:g} ans")
+        if self.max_experience is not None:
+            parts.append(f"expérience ≤ {self.max_experience:g} ans")
+        if self.job_titles:
+            parts.append(f"poste = {', '.join(self.job_titles)}")
+        return ", ".join(parts)
+
+
+def month_bounds(year: int, month: int):
+    return date(year, month, 1), date(year, month, monthrange(year, month)[1])
+
+
+def resolve_year(year: Optional[str], month: int, today: date) -> int:
+    """Sans année explicite, prendre l'occurrence passée la plus récente du mois"""
+    if year:
+        return int(year)
+    return today.year if month <= today.month else today.year - 1
+
+
+def parse_dates(text: str, today: date):
+    """Retourne (date_from, date_to) à partir d'une question normalisée"""
+    # Dates relatives
+    if "avant-hier" in text or "avant hier" in text:
+        day = today - timedelta(days=2)
+        return day, day
+    if "aujourd'hui" in text or "aujourdhui" in text or "ce jour" in text:
+        return today, today
+    if re.search(r"\bhier\b", text):
+        day = today - timedelta(days=1)
+        return day, day
+    match = last_days_pattern.search(text)
+    if match:
+        return today - timedelta(days=int(match.group(1))), today
+    if "semaine derniere" in text:
+        monday = today - timedelta(days=today.weekday() + 7)
+        return monday, monday + timedelta(days=6)
+    if "cette semaine" in text:
+        return today - timedelta(days=today.weekday()), today
+    if "mois dernier" in text:
+        last_day = today.replace(day=1) - timedelta(days=1)
+        return month_bounds(last_day.year, last_day.month)
+    if "ce mois" in text:
+        return today.replace(day=1), today
+    if "cette annee" in text:
+        return date(today.year, 1, 1), today
+
+    # Dates explicites (une ou deux bornes)
+    days = []
+    for match in numeric_date_pattern.finditer(text):
+        day, month, year = (int(value) for value in match.groups())
+        year = year + 2000 if year < 100 else year
+        try:
+            days.append(date(year, month, day))
+        except ValueError:
+            continue
+    for match in text_date_pattern.finditer(text):
+        day = 1 if match.group(1) == "1er" else int(match.group(1))
+        month = FRENCH_MONTHS[match.group(2)]
+        try:
+            days.append(date(resolve_year(match.group(3), month, today), month, day))
+        except ValueError:
+            continue
+    if days:
+        if len(days) >= 2:
+            return min(days), max(days)
+        day = days[0]
+        if re.search(r"\b(?:depuis|apres|a partir d)", text):
+            return day, today
+        if re.search(r"\b(?:avant|jusqu)", text):
+            return None, day
+        return day, day
+
+    # Mois entier ("août 2024", "08/2024") ou année entière
+    match = month_pattern.search(text)
+    if match:
+        month = FRENCH_MONTHS[match.group(1)]
+        return month_bounds(resolve_year(match.group(2), month, today), month)
+    match = numeric_month_pattern.search(text)
+    if match and 1 <= int(match.group(1)) <= 12:
+        return month_bounds(int(match.group(2)), int(match.group(1)))
+    match = year_pattern.search(text)
+    if match:
+        year = int(match.group(1))
+        return date(year, 1, 1), date(year, 12, 31)
+    return None, None
+
+
+def parse_experience(text: str):
+    """Retourne (minimum, maximum) d'années d'expérience"""
+    match = experience_range_pattern.search(text)
+    if match:
+        low, high = sorted(int(value) for value in match.groups())
+        return float(low), float(high)
+    minimum = maximum = None
+    max_spans = []
+    for match in experience_max_pattern.finditer(text):
+        if maximum is None:
+            maximum = float(match.group(1))
+        max_spans.append(match.span())
+    for match in experience_min_pattern.finditer(text):
+        # "moins de 5 ans d'expérience" : les années appartiennent au maximum
+        if any(match.start() < end and start < match.end() for start, end in max_spans):
+            continue
+        if max_qualifier_pattern.search(text[:match.start()]):
+            continue
+        minimum = float(match.group(1) or match.group(2))
+        break
+    return minimum, maximum
+
+
+def parse_job_titles(text: str):
+    """Retourne les postes cités et les termes à rechercher pour chacun"""
+    titles, terms = [], []
+    for title, variants in JOB_TITLES.items():
+        if any(re.search(rf"\b{re.escape(variant)}(?:s|x)?\b", text) for variant in variants):
+            titles.append(title)
+            terms.extend(variant for variant in variants if " " not in variant)
+    return titles, terms
+
+
+def plan_query(question: str, today: Optional[date] = None) -> QueryPlan:
+    """Analyse une question RH par règles : dates, ville marocaine, expérience et postes"""
+    today = today or date.today()
+    text = normalize_text(question).replace("’", "'")
+    plan = QueryPlan(question=question)
+    plan.date_from, plan.date_to = parse_dates(text, today)
+    plan.city = find_city(text)
+    plan.min_experience, plan.max_experience = parse_experience(text)
+    plan.job_titles, plan.search_terms = parse_job_titles(text)
+    return plan
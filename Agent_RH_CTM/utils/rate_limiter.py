@@ -0,0 +1,55 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """Limiteur de débit à seau de jetons, partagé entre plusieurs threads.
+
+    rate: nombre de jetons ajoutés par seconde
+    capacity: nombre maximum de jetons accumulés (taille des rafales)
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("Le débit doit être strictement positif")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute, burst=None):
+        """Crée un seau à partir d'un quota exprimé en requêtes par minute"""
+        return cls(rate=requests_per_minute / 60.0, capacity=burst)
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens=1):
+        """Prend des jetons sans attendre. Retourne False si le seau est vide."""
+        with self.lock:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1):
+        """Attend que des jetons soient disponibles puis les consomme.
+
+        Retourne le temps d'attente en secondes.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,121 @@
+import threading
+from collections import OrderedDict
+from utils.env_config import get_config
+
+# Tailles des deux niveaux du cache de recherche (en mémoire, par processus)
+embedding_cache_size = int(get_config("RETRIEVAL_EMBEDDING_CACHE_SIZE", "1024"))
+result_cache_size = int(get_config("RETRIEVAL_RESULT_CACHE_SIZE", "512"))
+
+
+def normalize_query(text):
+    """Requête sans différences d'espaces ni de casse"""
+    return " ".join((text or "").split()).lower()
+
+
+class LruCache:
+    """Dictionnaire LRU borné, protégé par un verrou, avec compteurs de succès et d'échecs"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class RetrievalCache:
+    """Cache de recherche à deux niveaux.
+
+    1. Embeddings des requêtes, indexés par texte normalisé (évite l'appel à Ollama).
+    2. Résultats de recherche, indexés par (requête, filtres, version de la table) ;
+       vidé dès que la version de la table 'cvs' change.
+    """
+
+    def __init__(self, embedding_entries=None, result_entries=None):
+        self.embeddings = LruCache(embedding_entries or embedding_cache_size)
+        self.results = LruCache(result_entries or result_cache_size)
+        self.lock = threading.Lock()
+        self.table_version = None
+        self.invalidations = 0
+
+    def query_embedding(self, embedder, query):
+        key = (embedder.id, embedder.dimensions, normalize_query(query))
+        embedding = self.embeddings.get(key)
+        if embedding is None:
+            embedding = embedder.get_embedding(query)
+            if embedding:
+                self.embeddings.put(key, embedding)
+        return embedding
+
+    def search_results(self, table_version, key, compute):
+        """Résultats en cache pour cette version de la table, ou calculés par compute()"""
+        with self.lock:
+            if table_version != self.table_version:
+                if self.table_version is not None:
+                    self.results.clear()
+                    self.invalidations += 1
+                self.table_version = table_version
+        key = (table_version,) + tuple(key)
+        results = self.results.get(key)
+        if results is None:
+            results = compute()
+            self.results.put(key, results)
+        return list(results)
+
+    def clear(self):
+        self.embeddings.clear()
+        self.results.clear()
+
+    def stats(self):
+        return {
+            "query_embeddings": self.embeddings.stats(),
+            "search_results": {
+                **self.results.stats(),
+                "table_version": self.table_version,
+                "invalidations": self.invalidations,
+            },
+        }
+
+
+_retrieval_cache = None
+_retrieval_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache():
+    """Cache de recherche partagé par toutes les instances de la base vectorielle du processus"""
+    global _retrieval_cache
+    with _retrieval_cache_lock:
+        if _retrieval_cache is None:
+            _retrieval_cache = RetrievalCache()
+        return _retrieval_cache
@@ -0,0 +1,68 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Nombre de runs récents dont on garde la trace des chunks déjà fournis
+max_tracked_runs = 256
+
+
+def chunk_key(content):
+    """Même empreinte que l'identifiant des lignes de la table (md5 du contenu)"""
+    return hashlib.md5((content or "").encode()).hexdigest()
+
+
+class RunChunkRegistry:
+    """Registre des chunks déjà remis au modèle pendant un run de l'agent.
+
+    Une recherche ne renvoie en entier que les chunks inédits, chacun avec une
+    référence courte (R1, R2...) ; un chunk déjà fourni est remplacé par un
+    renvoi vers sa référence.
+    """
+
+    def __init__(self, max_runs=max_tracked_runs):
+        self.max_runs = max_runs
+        self.runs = OrderedDict()
+        self.lock = threading.Lock()
+        self.returned = 0
+        self.repeats = 0
+        self.chars_saved = 0
+
+    def filter(self, run_id, documents):
+        """Retourne les documents (dictionnaires) avec les répétitions remplacées par des renvois"""
+        documents = [document if isinstance(document, dict) else document.to_dict() for document in documents]
+        if not run_id:
+            return documents
+        with self.lock:
+            seen = self.runs.get(run_id)
+            if seen is None:
+                seen = self.runs[run_id] = {}
+                while len(self.runs) > self.max_runs:
+                    self.runs.popitem(last=False)
+            self.runs.move_to_end(run_id)
+
+            filtered = []
+            for document in documents:
+                key = chunk_key(document.get("content"))
+                if key in seen:
+                    filtered.append({"deja_fourni": seen[key], "name": document.get("name")})
+                    self.repeats += 1
+                    self.chars_saved += len(document.get("content") or "")
+                    continue
+                seen[key] = f"R{len(seen) + 1}"
+                filtered.append({"ref": seen[key], **document})
+                self.returned += 1
+            return filtered
+
+    def stats(self):
+        with self.lock:
+            total = self.returned + self.repeats
+            return {
+                "tracked_runs": len(self.runs),
+                "chunks_returned": self.returned,
+                "repeats_skipped": self.repeats,
+                "repeat_rate": self.repeats / total if total else 0.0,
+                "chars_saved": self.chars_saved,
+            }
+
+
+run_chunks = RunChunkRegistry()
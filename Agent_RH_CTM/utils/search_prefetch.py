@@ -0,0 +1,113 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.cv_fields import normalize_text
+from utils.env_config import get_config
+from utils.retrieval_cache import normalize_query
+
+# Similarité minimale (Jaccard sur les mots utiles) entre la requête de l'outil et la question préchargée
+prefetch_match_threshold = float(get_config("PREFETCH_MATCH_THRESHOLD", "0.8"))
+prefetch_workers = int(get_config("PREFETCH_WORKERS", "4"))
+
+stop_words = {
+    "le", "la", "les", "l", "un", "une", "des", "de", "du", "d", "a", "au", "aux", "en", "et", "ou", "pour",
+    "avec", "sur", "dans", "par", "qui", "que", "quels", "quelles", "quel", "quelle", "est", "sont", "il",
+    "y", "moi", "me", "donne", "donner", "affiche", "afficher", "liste", "montre", "cherche", "trouve", "cv",
+}
+
+
+def query_words(text):
+    return {word for word in re.findall(r"\w+", normalize_text(text)) if word not in stop_words}
+
+
+def word_similarity(a, b):
+    words_a, words_b = query_words(a), query_words(b)
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+class SearchPrefetcher:
+    """Lance la recherche hybride sur la question brute en même temps que le premier appel au modèle.
+
+    Si l'outil de recherche est ensuite appelé avec une requête identique ou très proche,
+    le résultat préchargé (éventuellement encore en cours) est servi à la place d'une
+    nouvelle recherche. Les compteurs mesurent le taux de réussite.
+    """
+
+    def __init__(self, threshold=None, workers=None):
+        self.threshold = prefetch_match_threshold if threshold is None else threshold
+        self.executor = ThreadPoolExecutor(max_workers=workers or prefetch_workers, thread_name_prefix="prefetch")
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.unused = 0
+        self.saved_ms = 0.0
+
+    def start(self, vector_db, message, limit=5):
+        """Démarre la recherche sur la question, indexée par la question normalisée"""
+        key = normalize_query(message)
+        if not key:
+            return
+        with self.lock:
+            if key in self.pending:
+                return
+            started_at = time.perf_counter()
+            future = self.executor.submit(vector_db.search, message, limit)
+            self.pending[key] = {"query": message, "limit": limit, "future": future,
+                                 "started_at": started_at, "used": False}
+            self.started += 1
+
+    def take(self, message, query, limit):
+        """Résultat préchargé si la requête de l'outil correspond à la question, sinon None"""
+        with self.lock:
+            entry = self.pending.get(normalize_query(message or ""))
+        if entry is None:
+            return None
+        matched = (normalize_query(query) == normalize_query(entry["query"])
+                   or word_similarity(query, entry["query"]) >= self.threshold)
+        if not matched or limit > entry["limit"]:
+            with self.lock:
+                self.misses += 1
+            return None
+        requested_at = time.perf_counter()
+        try:
+            documents = entry["future"].result()
+        except Exception as e:
+            print(f"Préchargement de la recherche en échec: {str(e)}")
+            return None
+        finished_at = time.perf_counter()
+        with self.lock:
+            self.hits += 1
+            entry["used"] = True
+            # Temps de recherche épargné : durée totale moins l'attente restante au moment de l'appel
+            search_ms = (finished_at - entry["started_at"]) * 1000
+            self.saved_ms += max(0.0, search_ms - (finished_at - requested_at) * 1000)
+        return documents[:limit]
+
+    def finish(self, message):
+        """Oublie le préchargement d'une question à la fin du run"""
+        with self.lock:
+            entry = self.pending.pop(normalize_query(message or ""), None)
+            if entry is not None and not entry["used"]:
+                self.unused += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "started": self.started,
+                "hits": self.hits,
+                "misses": self.misses,
+                "unused": self.unused,
+                "hit_rate": self.hits / self.started if self.started else 0.0,
+                "match_rate": self.hits / lookups if lookups else 0.0,
+                "saved_ms": round(self.saved_ms, 1),
+                "in_flight": len(self.pending),
+            }
+
+
+search_prefetcher = SearchPrefetcher()
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import date
+from utils.answer_cache import normalize_question
+
+
+def singleflight_key(vector_db, message):
+    """Deux demandes identiques : même question normalisée, même version de la base, même jour"""
+    return (normalize_question(message), vector_db.table.version, date.today().isoformat())
+
+
+class SingleFlight:
+    """Regroupe les demandes identiques simultanées sur une seule exécution de l'agent.
+
+    La première demande lance l'exécution ; les suivantes, tant qu'elle est en cours,
+    attendent son résultat (réponse complète) ou suivent sa génération (flux SSE).
+    L'exécution partagée tourne dans sa propre tâche : l'abandon d'un demandeur ne
+    l'interrompt pas pour les autres.
+    """
+
+    def __init__(self):
+        self.tasks = {}
+        self.streams = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.coalesced_streams = 0
+
+    async def run(self, key, func):
+        """Retourne (résultat, partagé) ; func est une coroutine lancée une seule fois par clé"""
+        task = self.tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(func())
+            self.tasks[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda done: self.tasks.pop(key, None) if self.tasks.get(key) is done else None)
+        return await asyncio.shield(task), shared
+
+    def join_stream(self, key):
+        """Génération en cours pour cette clé, ou None"""
+        for stale in [stale for stale, buffer in self.streams.items() if buffer.finished]:
+            del self.streams[stale]
+        buffer = self.streams.get(key)
+        if buffer is None:
+            return None
+        self.coalesced_streams += 1
+        return buffer
+
+    def lead_stream(self, key, buffer):
+        self.streams[key] = buffer
+        self.leaders += 1
+
+    def stats(self):
+        coalesced = self.coalesced + self.coalesced_streams
+        return {
+            "leaders": self.leaders,
+            "coalesced": coalesced,
+            "coalesced_messages": self.coalesced,
+            "coalesced_streams": self.coalesced_streams,
+            "coalesced_rate": coalesced / (coalesced + self.leaders) if coalesced + self.leaders else 0.0,
+            "in_flight": len(self.tasks) + sum(1 for buffer in self.streams.values() if not buffer.finished),
+        }
+
+
+singleflight = SingleFlight()
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from utils.env_config import get_config
+
+# Intervalle des commentaires de maintien de connexion (proxys, load balancers)
+sse_heartbeat_seconds = float(get_config("SSE_HEARTBEAT_SECONDS", "15"))
+# Durée de conservation des événements d'une génération terminée, pour les reprises
+stream_buffer_ttl = float(get_config("STREAM_BUFFER_TTL_SECONDS", "300"))
+# Délai laissé au client pour se reconnecter avant d'interrompre une génération sans lecteur
+stream_resume_grace = float(get_config("STREAM_RESUME_GRACE_SECONDS", "30"))
+
+heartbeat_comment = ": ping\n\n"
+
+
+class StreamStats:
+    """Compteurs des flux SSE : générations, lecteurs, reprises, interruptions"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {
+            "started": 0, "completed": 0, "cancelled": 0, "errors": 0,
+            "disconnected": 0, "resumed": 0, "replayed_events": 0, "heartbeats": 0,
+        }
+        self.open = 0
+
+    def add(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "open": self.open}
+
+
+stream_stats = StreamStats()
+
+
+class StreamBuffer:
+    """Événements d'une génération de réponse, numérotés et rejouables.
+
+    La génération tourne dans sa propre tâche, indépendamment des connexions : un
+    client qui se reconnecte avec Last-Event-ID reçoit les événements manquants
+    puis suit la suite. Sans lecteur pendant le délai de grâce, la génération est
+    annulée (appel au modèle interrompu, plus aucun outil lancé).
+    """
+
+    def __init__(self, chat_id, grace=None):
+        self.chat_id = chat_id
+        self.generation = uuid.uuid4().hex[:8]
+        self.grace = stream_resume_grace if grace is None else grace
+        self.events = []
+        self.finished = False
+        self.finished_at = None
+        self.readers = 0
+        self.task = None
+        self.waiter = asyncio.Event()
+
+    def start(self, chunks):
+        self.task = asyncio.create_task(self.produce(chunks))
+        stream_stats.add("started")
+
+    async def produce(self, chunks):
+        try:
+            async for chunk in chunks:
+                self.append({"content": chunk, "chat_id": self.chat_id})
+            self.append({"done": True, "chat_id": self.chat_id})
+            stream_stats.add("completed")
+        except asyncio.CancelledError:
+            self.append({"error": "Génération interrompue", "chat_id": self.chat_id})
+            stream_stats.add("cancelled")
+            raise
+        except Exception as e:
+            self.append({"error": str(e)})
+            stream_stats.add("errors")
+        finally:
+            self.finished = True
+            self.finished_at = time.time()
+            self.notify()
+
+    def append(self, data):
+        self.events.append((f"{self.generation}:{len(self.events) + 1}", data))
+        self.notify()
+
+    def notify(self):
+        self.waiter.set()
+        self.waiter = asyncio.Event()
+
+    def position(self, last_event_id):
+        """Nombre d'événements déjà reçus d'après Last-Event-ID, None s'il vient d'une autre génération"""
+        generation, _, sequence = (last_event_id or "").partition(":")
+        if generation != self.generation or not sequence.isdigit():
+            return None
+        return min(int(sequence), len(self.events))
+
+    def answer(self):
+        """Texte complet de la génération si elle s'est terminée normalement, sinon None"""
+        if not self.events or not self.events[-1][1].get("done"):
+            return None
+        return "".join(data.get("content", "") for _, data in self.events)
+
+    def expired(self, now):
+        return self.finished and now - self.finished_at > stream_buffer_ttl
+
+    def reader_left(self):
+        self.readers -= 1
+        if self.readers == 0 and not self.finished:
+            asyncio.get_running_loop().call_later(self.grace, self.cancel_if_idle)
+
+    def cancel_if_idle(self):
+        if self.readers == 0 and not self.finished and self.task is not None:
+            print(f"🔌 Aucun client reconnecté au chat {self.chat_id}, génération interrompue")
+            self.task.cancel()
+
+    async def follow(self, position, is_disconnected, heartbeat=None, chat_id=None):
+        """Produit les événements SSE à partir de position, puis suit la génération en cours.
+
+        chat_id remplace celui de la génération pour un lecteur rattaché depuis un autre chat.
+        """
+        heartbeat = sse_heartbeat_seconds if heartbeat is None else heartbeat
+        self.readers += 1
+        with stream_stats.lock:
+            stream_stats.open += 1
+        completed = False
+        try:
+            while True:
+                while position < len(self.events):
+                    event_id, data = self.events[position]
+                    position += 1
+                    if chat_id and "chat_id" in data:
+                        data = {**data, "chat_id": chat_id}
+                    yield f"id: {event_id}\ndata: {json.dumps(data)}\n\n"
+                if self.finished:
+                    completed = True
+                    return
+                waiter = self.waiter
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    stream_stats.add("heartbeats")
+                    yield heartbeat_comment
+                if await is_disconnected():
+                    return
+        finally:
+            if not completed:
+                stream_stats.add("disconnected")
+            with stream_stats.lock:
+                stream_stats.open -= 1
+            self.reader_left()
+
+
+class StreamRegistry:
+    """Dernière génération suivie par chaque chat, conservée en mémoire pour les reprises"""
+
+    def __init__(self):
+        self.buffers = {}
+
+    def purge(self):
+        now = time.time()
+        for chat_id in [chat_id for chat_id, (buffer, _) in self.buffers.items() if buffer.expired(now)]:
+            del self.buffers[chat_id]
+
+    def start(self, chat_id, user_id, chunks):
+        """Lance une génération et la rend rejouable pour ce chat"""
+        buffer = StreamBuffer(chat_id)
+        self.attach(chat_id, user_id, buffer)
+        buffer.start(chunks)
+        return buffer
+
+    def attach(self, chat_id, user_id, buffer):
+        """Rend une génération rejouable pour un chat (y compris une génération partagée)"""
+        self.purge()
+        self.buffers[chat_id] = (buffer, user_id)
+
+    def resume(self, chat_id, user_id, last_event_id):
+        """Retourne (génération, position) pour une reprise, ou None si elle n'est plus disponible"""
+        self.purge()
+        buffer, owner = self.buffers.get(chat_id, (None, None))
+        if buffer is None or owner != user_id:
+            return None
+        position = buffer.position(last_event_id)
+        if position is None:
+            return None
+        stream_stats.add("resumed")
+        stream_stats.add("replayed_events", len(buffer.events) - position)
+        return buffer, position
+
+    def stats(self):
+        buffers = {id(buffer): buffer for buffer, _ in self.buffers.values()}
+        return {
+            **stream_stats.stats(),
+            "buffers": len(buffers),
+            "running": sum(1 for buffer in buffers.values() if not buffer.finished),
+        }
+
+
+stream_registry = StreamRegistry()